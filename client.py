@@ -10,6 +10,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", help="Server IP", default=HOST, type=str)
     parser.add_argument("--port", help="Server listening port", default=PORT, type=int)
+    parser.add_argument(
+        "--url",
+        help="Server url (tcp://host:port or unix:///path), instead of host and port",
+        type=str,
+    )
     parser.add_argument(
         "--player_name",
         help="Player's name",
@@ -24,12 +29,48 @@ if __name__ == "__main__":
         choices=["Poirot", "Canaan", "Nexto"],
     )
     parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--seed", help="Seed of the parameters tuning", type=int)
+    parser.add_argument(
+        "--table", help="Table to join, any table with free seats if not given"
+    )
+    parser.add_argument(
+        "--push_views",
+        help="Receive the game state after each move instead of requesting it",
+        default=False,
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "--match",
+        help="Wait for a table of this many players formed by the server",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--session",
+        help="Ask to play the epochs in a row at the same table",
+        default=False,
+        action="store_const",
+        const=True,
+    )
     args = parser.parse_args()
+    if args.url is not None:
+        args.host = args.url
     # Select type of player
     if not args.bot:
-        player = player.Human(args.host, args.port, args.player_name)
+        player = player.Human(args.host, args.port, args.player_name, args.table)
     elif args.bot == "Poirot":
-        player = player.Poirot(args.host, args.port, args.player_name, args.epochs)
+        player = player.Poirot(
+            args.host,
+            args.port,
+            args.player_name,
+            args.epochs,
+            seed=args.seed,
+            table=args.table,
+            push_views=args.push_views,
+            match_size=args.match,
+            session=args.session,
+        )
     elif args.bot == "Canaan":
         player = player.CanaanBot(
             args.host,
@@ -38,6 +79,11 @@ if __name__ == "__main__":
             args.epochs,
             "params/canaan2_params.json",
             args.evolve,
+            args.seed,
+            args.table,
+            args.push_views,
+            args.match,
+            args.session,
         )
     elif args.bot == "Nexto":
         player = player.Nexto(
@@ -47,6 +93,11 @@ if __name__ == "__main__":
             args.epochs,
             "params/nexto1_params.json",
             args.evolve,
+            args.seed,
+            args.table,
+            args.push_views,
+            args.match,
+            args.session,
         )
 
     player.run()
@@ -11,3 +11,8 @@ INITIAL_DECK = np.array(
     [CARD_COUNT for _ in range(5)],
     dtype=np.uint8,
 )
+# Cards are identified by the id Game gives them when building the deck:
+# values in increasing order, colors in COLORS order for each copy
+CARD_VALUES = np.repeat(np.arange(1, 6, dtype=np.uint8), np.array(CARD_COUNT) * 5)
+CARD_COLORS = np.tile(np.arange(5, dtype=np.uint8), sum(CARD_COUNT))
+DECK_SIZE = CARD_VALUES.shape[0]
@@ -1,8 +1,4 @@
 # Data to be passed from client to server
-import pickle
-
-from constants import DATASIZE
-
 
 # Generic object
 class GameData(object):
@@ -11,23 +7,16 @@ class GameData(object):
         self.sender = sender
 
     def serialize(self) -> bytes:
-        data = pickle.dumps(self)
-        datalen = len(data)
-        binaryDataLen: bytes  = datalen.to_bytes(2, 'little')
-        totdata = bytearray(binaryDataLen) + data
-        #ensure no multiple data on same request
-        for _ in range(datalen + len(binaryDataLen), DATASIZE):
-            totdata.append(0)
-        data = bytes(totdata)
-        assert(len(data) == DATASIZE)
-        return data
+        data = codec.encode(self)
+        binaryDataLen: bytes = len(data).to_bytes(2, 'little')
+        # Frames are as long as their payload: use a FrameReader to split them
+        return binaryDataLen + data
 
     def deserialize(serialized: bytes):
         binarySize = serialized[0:2]
         assert(len(binarySize) == 2)
         datasize = int.from_bytes(binarySize, 'little')
-        data = serialized[2:datasize + 2]
-        return pickle.loads(data)
+        return codec.decode(serialized[2:datasize + 2])
 
 
 # Client to server
@@ -44,29 +33,58 @@ class ClientHintData(ClientToServerData):
     type: can be "color" or "value"
     value: can be the color or the value of the card
     positions: a list of cards that satisfy the value of the hint (notice, this will probably not be needed anymore)
+    turn: the turn of the game state the move was chosen on, 0 if not known.
+        The server refuses a move whose turn is over, e.g. because its time was over.
     '''
-    def __init__(self, sender: str, destination: str, type: str, value) -> None:
+    def __init__(self, sender: str, destination: str, type: str, value, turn: int = 0) -> None:
         action = "Hint data from client to server"
         self.destination = destination
         self.type = type
         self.value = value
+        self.turn = turn
         super().__init__(sender, action)
 
 class ClientPlayerAddData(ClientToServerData):
     '''
     A connection request from client to server.
     The client requests the server to be added to the lobby.
+    table: the name of the table to join, or None to join any table with free seats.
+    pushViews: if True the server sends the player its game state (as ServerGameStateData)
+        after each move, so there is no need to request it.
     '''
-    def __init__(self, sender) -> None:
+    def __init__(self, sender, table=None, pushViews=False) -> None:
         action = "Connection request"
+        self.table = table
+        self.pushViews = pushViews
+        super().__init__(sender, action)
+
+class ClientMatchRequest(ClientToServerData):
+    '''
+    A request from client to server to be seated at a table formed by the server.
+    The client waits in the pool until the server forms a table for it, then it is added
+    to its lobby as with ClientPlayerAddData.
+    botType: the kind of player, used to choose who plays together.
+    tableSize: the number of players of the table to join.
+    pushViews: as in ClientPlayerAddData.
+    '''
+    def __init__(self, sender, botType, tableSize, pushViews=False) -> None:
+        action = "Match request"
+        self.botType = botType
+        self.tableSize = tableSize
+        self.pushViews = pushViews
         super().__init__(sender, action)
 
 class ClientPlayerStartRequest(ClientToServerData):
     '''
     The client says it's ready to play.
+    sessionGames: if not 0, the number of games the player wants to play in a row.
+        When every player asks for the same number the table plays a session: each game
+        is dealt as soon as the previous one ends and every player receives its game
+        state with the deal, so there is no need to request it.
     '''
-    def __init__(self, sender) -> None:
+    def __init__(self, sender, sessionGames=0) -> None:
         action = "Player start request"
+        self.sessionGames = sessionGames
         super().__init__(sender, action)
 
 class ClientPlayerReadyData(ClientToServerData):
@@ -92,10 +110,12 @@ class ClientPlayerDiscardCardRequest(ClientToServerData):
     Used to discard a card.
     handCardOrdered: the card in hand you want to discard 
             (card 0 is the leftmost, card N is the rightmost).
+    turn: as in ClientHintData.
     '''
-    def __init__(self, sender, handCardOrdered: int) -> None:
+    def __init__(self, sender, handCardOrdered: int, turn: int = 0) -> None:
         action = "Discard card request"
         self.handCardOrdered = handCardOrdered
+        self.turn = turn
         super().__init__(sender, action)
 
 class ClientPlayerPlayCardRequest(ClientToServerData):
@@ -103,10 +123,12 @@ class ClientPlayerPlayCardRequest(ClientToServerData):
     Used to play a card.
     handCardOrdered: the card in hand you want to play 
         (card 0 is the leftmost, card N is the rightmost).
+    turn: as in ClientHintData.
     '''
-    def __init__(self, sender, handCardOrdered: int) -> None:
+    def __init__(self, sender, handCardOrdered: int, turn: int = 0) -> None:
         action = "Play card request"
         self.handCardOrdered = handCardOrdered
+        self.turn = turn
         super().__init__(sender, action)
 
 # Server to client
@@ -167,10 +189,12 @@ class ServerStartGameData(ServerToClientData):
     You are not in the lobby anymore. 
     Remember to tell the server that you received this message.
     players: the list of players in turn order.
+    sessionGames: the games of the session, 0 if the players did not agree on one.
     '''
-    def __init__(self, players) -> None:
+    def __init__(self, players, sessionGames=0) -> None:
         action = "Game start"
         self.players = players
+        self.sessionGames = sessionGames
         super().__init__(action)
 
 class ServerGameStateData(ServerToClientData):
@@ -183,9 +207,13 @@ class ServerGameStateData(ServerToClientData):
     usedStormTokens: used red (storm) tokens. 0 is the minimum, 3 is the maximum. At 3 the game is over.
     tableCards: shows the cards that are currently being played (forming the current firework).
     discardPile: shows the discard pile.
+    turnTimeLeft: milliseconds left to the current player to make a move, 0 if turns
+        have no time limit.
+    turn: the turn this state belongs to, counted by the table, to be sent with the
+        move chosen on it. 0 if not known.
     NOTE: params might get added on request, if the game allows for it.
     '''
-    def __init__(self, currentPlayer: str, handSize: int, players: list, usedNoteTokens: int, usedStormTokens: int, table: list, discard: list) -> None:
+    def __init__(self, currentPlayer: str, handSize: int, players: list, usedNoteTokens: int, usedStormTokens: int, table: list, discard: list, turnTimeLeft: int = 0, turn: int = 0) -> None:
         action = "Show cards response"
         self.currentPlayer = currentPlayer
         self.handSize = handSize
@@ -194,6 +222,8 @@ class ServerGameStateData(ServerToClientData):
         self.usedStormTokens = usedStormTokens
         self.tableCards = table
         self.discardPile = discard
+        self.turnTimeLeft = turnTimeLeft
+        self.turn = turn
         super().__init__(action)
 
 
@@ -291,4 +321,8 @@ class ServerGameOver(ServerToClientData):
         self.message = "Game over"
         self.score = score
         self.scoreMessage = scoreMessage
-        super().__init__(action)
\ No newline at end of file
+        super().__init__(action)
+
+
+# Messages are defined, the codec can refer to them
+from . import codec
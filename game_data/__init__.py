@@ -1,2 +1,5 @@
 from .GameData import *
-from .game import Game, Card
\ No newline at end of file
+from .game import Game, Card, MoveDelta, checkMakeUnmake
+from .batch_game import BatchGame
+from .vector_env import HanabiVectorEnv, ObservationLayout
+from .framing import FrameReader
@@ -0,0 +1,259 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from constants import CARD_COLORS, CARD_VALUES, DECK_SIZE
+
+# Lookup tables where the id -1 (empty slot) maps to an impossible color/value
+_COLOR_OF = np.append(CARD_COLORS, np.uint8(255))
+_VALUE_OF = np.append(CARD_VALUES, np.uint8(255))
+
+
+class BatchGame:
+    """
+    BatchGame advances many games of Hanabi in lockstep, with the same rules of `Game`.
+
+    Every piece of state is an array with a leading game axis. Cards are the ids used by
+    `Game` (see `constants.CARD_VALUES` and `constants.CARD_COLORS`), -1 is an empty slot.
+    Decks are stored in draw order.
+
+    Actions are integers in [0, num_actions):
+        [0, H)              play card in position a
+        [H, 2H)             discard card in position a - H
+        [2H, num_actions)   hint: with k = a - 2H, the destination is the player
+                            k // 10 + 1 seats after the current one. k % 10 < 5 is a hint
+                            of color COLORS[k % 10], otherwise of value k % 10 - 4.
+
+    Like `Game`, a game ends only with the third storm token or after the last round,
+    since its firework check never ends a game with a complete table.
+
+    Attributes
+    ----------
+    deck: np.ndarray
+        (games, 50) card ids in draw order.
+    drawn: np.ndarray
+        (games,) number of cards already drawn from the deck.
+    hands: np.ndarray
+        (games, players, hand_size) card ids, in the order used by `Game`.
+    fireworks: np.ndarray
+        (games, 5) height of the firework of each color.
+    discards: np.ndarray
+        (games, 5, 5) count of discarded cards. Rows are colors, columns are (values - 1).
+    note_tokens: np.ndarray
+        (games,) used note tokens.
+    storm_tokens: np.ndarray
+        (games,) used storm tokens.
+    knowledge: np.ndarray
+        (games, players, hand_size, 5, 5) what hints told about each card, like
+        `CardKnowledge.can_be`: True if the card can be of that color (row) and value.
+    current: np.ndarray
+        (games,) index of the player that has to move.
+    done: np.ndarray
+        (games,) True if the game is over.
+    score: np.ndarray
+        (games,) final score of ended games, 0 for the others.
+    """
+
+    MAX_NOTE_TOKENS = 8
+    MAX_STORM_TOKENS = 3
+
+    def __init__(
+        self,
+        num_games: int,
+        num_players: int,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        if not 2 <= num_players <= 5:
+            raise ValueError("Hanabi is played by 2 to 5 players")
+        self.num_games = num_games
+        self.num_players = num_players
+        self.hand_size = 5 if num_players < 4 else 4
+        self.num_actions = 2 * self.hand_size + 10 * (num_players - 1)
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        self._games = np.arange(num_games)
+        self.deck = np.zeros([num_games, DECK_SIZE], dtype=np.uint8)
+        self.drawn = np.zeros(num_games, dtype=np.int16)
+        self.hands = np.full(
+            [num_games, num_players, self.hand_size], -1, dtype=np.int8
+        )
+        self.fireworks = np.zeros([num_games, 5], dtype=np.uint8)
+        self.discards = np.zeros([num_games, 5, 5], dtype=np.uint8)
+        self.knowledge = np.ones(
+            [num_games, num_players, self.hand_size, 5, 5], dtype=bool
+        )
+        self.note_tokens = np.zeros(num_games, dtype=np.uint8)
+        self.storm_tokens = np.zeros(num_games, dtype=np.uint8)
+        self.current = np.zeros(num_games, dtype=np.int8)
+        self.last_turn = np.zeros(num_games, dtype=bool)
+        self.last_moves = np.zeros(num_games, dtype=np.int8)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.score = np.zeros(num_games, dtype=np.uint8)
+        self.reset()
+
+    def reset(
+        self, decks: Optional[np.ndarray] = None, mask: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Start new games, dealing cards as `Game.start` does.
+
+        Parameters
+        ----------
+        decks: Optional[np.ndarray]
+            (games, 50) card ids in draw order, one row for each game to reset.
+            Shuffled with `rng` if not given.
+        mask: Optional[np.ndarray]
+            (games,) True for the games to reset. All games if not given.
+        """
+        games = self._games if mask is None else np.flatnonzero(mask)
+        if decks is None:
+            decks = self.rng.permuted(
+                np.tile(np.arange(DECK_SIZE, dtype=np.uint8), (games.shape[0], 1)),
+                axis=1,
+            )
+        self.deck[games] = decks
+        dealt = self.num_players * self.hand_size
+        if self.num_players < 4:
+            # Each player takes his whole hand before the next one
+            hands = decks[:, :dealt].reshape(-1, self.num_players, self.hand_size)
+        else:
+            # One card at time for each player
+            hands = decks[:, :dealt].reshape(-1, self.hand_size, self.num_players)
+            hands = hands.transpose(0, 2, 1)
+        self.hands[games] = hands
+        self.drawn[games] = dealt
+        self.fireworks[games] = 0
+        self.discards[games] = 0
+        self.knowledge[games] = True
+        self.note_tokens[games] = 0
+        self.storm_tokens[games] = 0
+        self.current[games] = 0
+        self.last_turn[games] = False
+        self.last_moves[games] = self.num_players + 1
+        self.done[games] = False
+        self.score[games] = 0
+
+    def legal_actions(self) -> np.ndarray:
+        """(games, num_actions) mask of the actions the current player can do."""
+        H = self.hand_size
+        legal = np.zeros([self.num_games, self.num_actions], dtype=bool)
+        own = self.hands[self._games, self.current] >= 0
+        legal[:, :H] = own
+        legal[:, H : 2 * H] = own & (self.note_tokens >= 1)[:, None]
+        # Hints need a note token and at least a card touched in destination's hand
+        seats = (
+            self.current[:, None] + np.arange(1, self.num_players)
+        ) % self.num_players
+        targets = self.hands[self._games[:, None], seats]
+        colors = _COLOR_OF[targets][..., None] == np.arange(5)
+        values = _VALUE_OF[targets][..., None] == np.arange(1, 6)
+        touched = np.concatenate([colors.any(axis=2), values.any(axis=2)], axis=2)
+        can_hint = self.note_tokens < self.MAX_NOTE_TOKENS
+        legal[:, 2 * H :] = touched.reshape(self.num_games, -1) & can_hint[:, None]
+        legal[self.done] = False
+        return legal
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Apply one action for each game. Actions of ended games are ignored.
+
+        Returns
+        -------
+        done: np.ndarray
+            (games,) True if the game is over.
+        score: np.ndarray
+            (games,) final score of ended games, 0 for the others.
+        """
+        actions = np.asarray(actions)
+        active = np.logical_not(self.done)
+        legal = self.legal_actions()[
+            self._games, np.clip(actions, 0, self.num_actions - 1)
+        ]
+        illegal = active & np.logical_not(
+            legal & (actions >= 0) & (actions < self.num_actions)
+        )
+        if np.any(illegal):
+            raise ValueError(f"Illegal actions in games {np.flatnonzero(illegal)}")
+
+        H = self.hand_size
+        play = np.flatnonzero(active & (actions < H))
+        discard = np.flatnonzero(active & (actions >= H) & (actions < 2 * H))
+        hint = np.flatnonzero(active & (actions >= 2 * H))
+        self._play(play, actions[play])
+        self._discard(discard, actions[discard] - H)
+        self._hint(hint, actions[hint] - 2 * H)
+
+        self.current[active] = (self.current[active] + 1) % self.num_players
+        self._check_ended(active)
+        return self.done, self.score
+
+    def _play(self, games: np.ndarray, positions: np.ndarray) -> None:
+        cards = self.hands[games, self.current[games], positions]
+        colors = CARD_COLORS[cards]
+        values = CARD_VALUES[cards]
+        ok = self.fireworks[games, colors] + 1 == values
+        self.fireworks[games[ok], colors[ok]] += 1
+        # Completing a firework gives back a note token
+        refund = ok & (values == 5) & (self.note_tokens[games] > 0)
+        self.note_tokens[games[refund]] -= 1
+        wrong = np.logical_not(ok)
+        np.add.at(self.discards, (games[wrong], colors[wrong], values[wrong] - 1), 1)
+        self.storm_tokens[games[wrong]] += 1
+        self._replace_card(games, positions)
+
+    def _discard(self, games: np.ndarray, positions: np.ndarray) -> None:
+        cards = self.hands[games, self.current[games], positions]
+        self.note_tokens[games] -= 1
+        np.add.at(self.discards, (games, CARD_COLORS[cards], CARD_VALUES[cards] - 1), 1)
+        self._replace_card(games, positions)
+
+    def _hint(self, games: np.ndarray, hints: np.ndarray) -> None:
+        self.note_tokens[games] += 1
+        destinations = (self.current[games] + hints // 10 + 1) % self.num_players
+        kinds = hints % 10
+        is_color = kinds < 5
+        cards = self.hands[games, destinations]
+        touched = np.where(
+            is_color[:, None],
+            _COLOR_OF[cards] == kinds[:, None],
+            _VALUE_OF[cards] == kinds[:, None] - 4,
+        )
+        # Touched cards can only be of the hinted color (a row) or value (a column)
+        mask = np.zeros([games.shape[0], 5, 5], dtype=bool)
+        rows = np.flatnonzero(is_color)
+        columns = np.flatnonzero(np.logical_not(is_color))
+        mask[rows, kinds[rows]] = True
+        mask[columns, :, kinds[columns] - 5] = True
+        self.knowledge[games, destinations] &= np.where(
+            touched[..., None, None], mask[:, None], True
+        )
+
+    def _replace_card(self, games: np.ndarray, positions: np.ndarray) -> None:
+        """Remove card in `positions` shifting the following ones, then draw if possible."""
+        players = self.current[games]
+        hands = self.hands[games, players]
+        slots = np.arange(self.hand_size)
+        source = np.minimum(slots + (slots >= positions[:, None]), self.hand_size - 1)
+        hands = np.take_along_axis(hands, source, axis=1)
+        can_draw = self.drawn[games] < DECK_SIZE
+        next_cards = self.deck[games, np.minimum(self.drawn[games], DECK_SIZE - 1)]
+        hands[:, -1] = np.where(can_draw, next_cards, -1)
+        self.hands[games, players] = hands
+        knowledge = np.take_along_axis(
+            self.knowledge[games, players], source[:, :, None, None], axis=1
+        )
+        knowledge[:, -1] = True
+        self.knowledge[games, players] = knowledge
+        self.drawn[games] += can_draw
+
+    def _check_ended(self, moved: np.ndarray) -> None:
+        empty_deck = moved & (self.drawn == DECK_SIZE)
+        self.last_turn |= empty_deck
+        self.last_moves[empty_deck] -= 1
+        stormed = moved & (self.storm_tokens == self.MAX_STORM_TOKENS)
+        finished = (
+            moved & self.last_turn & (self.last_moves == 0) & np.logical_not(stormed)
+        )
+        self.score[stormed] = 0
+        self.score[finished] = np.sum(self.fireworks[finished], axis=1)
+        self.done |= stormed | finished
@@ -0,0 +1,364 @@
+from typing import Callable, Dict, List, Tuple
+
+from constants import COLORS
+
+from .GameData import *
+from .game import CARDS, Player
+
+# Wire format: version, message type, then the fields of the message in schema order.
+# Cards are sent as their id, strings as 2 bytes of length and UTF-8 bytes.
+VERSION = 7
+
+_NONE = 0xFFFF
+
+
+def _put_u8(out: bytearray, value: int) -> None:
+    out.append(value)
+
+
+def _get_u8(data: memoryview, offset: int) -> Tuple[int, int]:
+    return data[offset], offset + 1
+
+
+def _put_i8(out: bytearray, value: int) -> None:
+    # Bots send numpy integers
+    out += int(value).to_bytes(1, "little", signed=True)
+
+
+def _get_i8(data: memoryview, offset: int) -> Tuple[int, int]:
+    return int.from_bytes(data[offset : offset + 1], "little", signed=True), offset + 1
+
+
+def _put_u32(out: bytearray, value: int) -> None:
+    out += value.to_bytes(4, "little")
+
+
+def _get_u32(data: memoryview, offset: int) -> Tuple[int, int]:
+    return int.from_bytes(data[offset : offset + 4], "little"), offset + 4
+
+
+def _put_bool(out: bytearray, value: bool) -> None:
+    out.append(1 if value else 0)
+
+
+def _get_bool(data: memoryview, offset: int) -> Tuple[bool, int]:
+    return data[offset] != 0, offset + 1
+
+
+def _put_str(out: bytearray, value: str) -> None:
+    if value is None:
+        out += _NONE.to_bytes(2, "little")
+        return
+    encoded = value.encode()
+    out += len(encoded).to_bytes(2, "little")
+    out += encoded
+
+
+def _get_str(data: memoryview, offset: int) -> Tuple[str, int]:
+    length = data[offset] | data[offset + 1] << 8
+    offset += 2
+    if length == _NONE:
+        return None, offset
+    return str(data[offset : offset + length], "utf-8"), offset + length
+
+
+def _put_card(out: bytearray, card) -> None:
+    out.append(card.id)
+
+
+def _get_card(data: memoryview, offset: int):
+    return CARDS[data[offset]], offset + 1
+
+
+def _put_cards(out: bytearray, cards) -> None:
+    out.append(len(cards))
+    out += bytes(card.id for card in cards)
+
+
+def _get_cards(data: memoryview, offset: int):
+    count = data[offset]
+    offset += 1
+    return [CARDS[id] for id in data[offset : offset + count]], offset + count
+
+
+def _put_u8_list(out: bytearray, values: List[int]) -> None:
+    out.append(len(values))
+    out += bytes(values)
+
+
+def _get_u8_list(data: memoryview, offset: int):
+    count = data[offset]
+    offset += 1
+    return list(data[offset : offset + count]), offset + count
+
+
+def _put_str_list(out: bytearray, values: List[str]) -> None:
+    out.append(len(values))
+    for value in values:
+        _put_str(out, value)
+
+
+def _get_str_list(data: memoryview, offset: int):
+    count = data[offset]
+    offset += 1
+    values = []
+    for _ in range(count):
+        value, offset = _get_str(data, offset)
+        values.append(value)
+    return values, offset
+
+
+def _put_hint_value(out: bytearray, value) -> None:
+    """Values are sent as they are, colors after them."""
+    out.append(8 + COLORS.index(value) if isinstance(value, str) else value)
+
+
+def _get_hint_value(data: memoryview, offset: int):
+    value = data[offset]
+    return (COLORS[value - 8] if value >= 8 else value), offset + 1
+
+
+def _put_players(out: bytearray, players: List[Player]) -> None:
+    out.append(len(players))
+    for player in players:
+        _put_str(out, player.name)
+        _put_cards(out, player.hand)
+
+
+def _get_players(data: memoryview, offset: int):
+    count = data[offset]
+    offset += 1
+    players = []
+    for _ in range(count):
+        name, offset = _get_str(data, offset)
+        player = Player(name)
+        player.hand, offset = _get_cards(data, offset)
+        players.append(player)
+    return players, offset
+
+
+def _put_table(out: bytearray, table: Dict[str, list]) -> None:
+    for color in COLORS:
+        _put_cards(out, table.get(color, []))
+
+
+def _get_table(data: memoryview, offset: int):
+    table = {}
+    for color in COLORS:
+        table[color], offset = _get_cards(data, offset)
+    return table, offset
+
+
+def _put_message(out: bytearray, message) -> None:
+    # Invalid data is either the request received or the name of a field
+    if isinstance(message, str):
+        out.append(1)
+        _put_str(out, message)
+    else:
+        out.append(0)
+        _encode_into(out, message)
+
+
+def _get_message(data: memoryview, offset: int):
+    if data[offset] == 1:
+        return _get_str(data, offset + 1)
+    return _decode_from(data, offset + 1)
+
+
+U8 = (_put_u8, _get_u8)
+I8 = (_put_i8, _get_i8)
+U32 = (_put_u32, _get_u32)
+BOOL = (_put_bool, _get_bool)
+STR = (_put_str, _get_str)
+CARD = (_put_card, _get_card)
+CARDS_LIST = (_put_cards, _get_cards)
+U8_LIST = (_put_u8_list, _get_u8_list)
+STR_LIST = (_put_str_list, _get_str_list)
+HINT_VALUE = (_put_hint_value, _get_hint_value)
+PLAYERS = (_put_players, _get_players)
+TABLE = (_put_table, _get_table)
+MESSAGE = (_put_message, _get_message)
+
+# For each message: its class, the fields on the wire and the attributes that are the
+# same for every message of the class. The type byte is the position in this list.
+SCHEMAS = [
+    (
+        ClientHintData,
+        [
+            ("sender", STR),
+            ("destination", STR),
+            ("type", STR),
+            ("value", HINT_VALUE),
+            ("turn", U32),
+        ],
+        {"action": "Hint data from client to server"},
+    ),
+    (
+        ClientPlayerAddData,
+        [("sender", STR), ("table", STR), ("pushViews", BOOL)],
+        {"action": "Connection request"},
+    ),
+    (
+        ClientPlayerStartRequest,
+        [("sender", STR), ("sessionGames", U32)],
+        {"action": "Player start request"},
+    ),
+    (
+        ClientPlayerReadyData,
+        [("sender", STR)],
+        {"action": "Player start status received"},
+    ),
+    (
+        ClientGetGameStateRequest,
+        [("sender", STR)],
+        {"action": "Show cards request"},
+    ),
+    (
+        ClientPlayerDiscardCardRequest,
+        [("sender", STR), ("handCardOrdered", I8), ("turn", U32)],
+        {"action": "Discard card request"},
+    ),
+    (
+        ClientPlayerPlayCardRequest,
+        [("sender", STR), ("handCardOrdered", I8), ("turn", U32)],
+        {"action": "Play card request"},
+    ),
+    (
+        ServerHintData,
+        [
+            ("source", STR),
+            ("destination", STR),
+            ("type", STR),
+            ("value", HINT_VALUE),
+            ("positions", U8_LIST),
+            ("player", STR),
+        ],
+        {"sender": "Game Server", "action": "Hint data from server to destination client"},
+    ),
+    (
+        ServerPlayerConnectionOk,
+        [("message", STR)],
+        {"sender": "Game Server", "action": "Connection ok"},
+    ),
+    (
+        ServerPlayerStartRequestAccepted,
+        [("connectedPlayers", U8), ("acceptedStartRequests", U8)],
+        {"sender": "Game Server", "action": "Player start request accepted"},
+    ),
+    (
+        ServerStartGameData,
+        [("players", STR_LIST), ("sessionGames", U32)],
+        {"sender": "Game Server", "action": "Game start"},
+    ),
+    (
+        ServerGameStateData,
+        [
+            ("currentPlayer", STR),
+            ("handSize", U8),
+            ("players", PLAYERS),
+            ("usedNoteTokens", U8),
+            ("usedStormTokens", U8),
+            ("tableCards", TABLE),
+            ("discardPile", CARDS_LIST),
+            ("turnTimeLeft", U32),
+            ("turn", U32),
+        ],
+        {"sender": "Game Server", "action": "Show cards response"},
+    ),
+    (
+        ServerActionValid,
+        [
+            ("player", STR),
+            ("lastPlayer", STR),
+            ("action", STR),
+            ("card", CARD),
+            ("cardHandIndex", U8),
+            ("handLength", U8),
+        ],
+        {"sender": "Game Server"},
+    ),
+    (
+        ServerPlayerMoveOk,
+        [
+            ("player", STR),
+            ("lastPlayer", STR),
+            ("card", CARD),
+            ("cardHandIndex", U8),
+            ("handLength", U8),
+        ],
+        {"sender": "Game Server", "action": "Correct move! Well done!"},
+    ),
+    (
+        ServerPlayerThunderStrike,
+        [
+            ("player", STR),
+            ("lastPlayer", STR),
+            ("card", CARD),
+            ("cardHandIndex", U8),
+            ("handLength", U8),
+        ],
+        {"sender": "Game Server", "action": "The Gods are angry at you!"},
+    ),
+    (
+        ServerActionInvalid,
+        [("message", STR)],
+        {"sender": "Game Server", "action": "Invalid action"},
+    ),
+    (
+        ServerInvalidDataReceived,
+        [("data", MESSAGE)],
+        {"sender": "Game Server", "action": "Invalid data received"},
+    ),
+    (
+        ServerGameOver,
+        [("score", U8), ("scoreMessage", STR)],
+        {"sender": "Game Server", "action": "Game over", "message": "Game over"},
+    ),
+    (
+        ClientMatchRequest,
+        [("sender", STR), ("botType", STR), ("tableSize", U8), ("pushViews", BOOL)],
+        {"action": "Match request"},
+    ),
+]
+
+_TYPE_IDS = {schema[0]: i for i, schema in enumerate(SCHEMAS)}
+_ENCODERS = [
+    [(name, field[0]) for name, field in fields] for _, fields, _ in SCHEMAS
+]  # type: List[List[Tuple[str, Callable]]]
+_DECODERS = [
+    [(name, field[1]) for name, field in fields] for _, fields, _ in SCHEMAS
+]  # type: List[List[Tuple[str, Callable]]]
+
+
+def _encode_into(out: bytearray, message: GameData) -> None:
+    type_id = _TYPE_IDS[type(message)]
+    out.append(type_id)
+    for name, put in _ENCODERS[type_id]:
+        put(out, getattr(message, name))
+
+
+def _decode_from(data: memoryview, offset: int):
+    type_id = data[offset]
+    offset += 1
+    cls, _, constants = SCHEMAS[type_id]
+    message = cls.__new__(cls)
+    message.__dict__.update(constants)
+    for name, get in _DECODERS[type_id]:
+        value, offset = get(data, offset)
+        setattr(message, name, value)
+    return message, offset
+
+
+def encode(message: GameData) -> bytes:
+    """Encode `message` with the binary codec."""
+    out = bytearray((VERSION,))
+    _encode_into(out, message)
+    return bytes(out)
+
+
+def decode(data: bytes) -> GameData:
+    """Decode a message encoded with `encode`."""
+    data = memoryview(data)
+    if data[0] != VERSION:
+        raise ValueError(f"Unsupported codec version {data[0]}")
+    return _decode_from(data, 1)[0]
@@ -0,0 +1,97 @@
+import argparse
+import pickle
+import timeit
+from typing import List
+
+from constants import COLORS, DATASIZE
+
+from .codec import decode, encode
+from .GameData import *
+from .game import CARDS, Player
+
+
+def pickle_serialize(message: GameData) -> bytes:
+    """The previous serialization, kept to compare the codecs."""
+    data = pickle.dumps(message)
+    totdata = bytearray(len(data).to_bytes(2, "little")) + data
+    for _ in range(len(data) + 2, DATASIZE):
+        totdata.append(0)
+    return bytes(totdata)
+
+
+def pickle_deserialize(serialized: bytes) -> GameData:
+    datasize = int.from_bytes(serialized[0:2], "little")
+    return pickle.loads(serialized[2 : datasize + 2])
+
+
+def sample_messages() -> List[GameData]:
+    """
+    Messages of every type as they are during a game of 5 players, with the optional
+    fields set. The tests of the codec round trip them too.
+    """
+    names = [f"Bot{i}" for i in range(5)]
+    players = [Player(name) for name in names]
+    for i, player in enumerate(players[1:]):
+        player.hand = list(CARDS[i * 4 : i * 4 + 4])
+    table = {color: [] for color in COLORS}
+    table["red"] = [CARDS[0], CARDS[15]]
+    return [
+        ClientHintData("Bot0", "Bot1", "color", "red"),
+        ClientHintData("Bot0", "Bot1", "value", 4, 12),
+        ClientPlayerAddData("Bot0"),
+        ClientPlayerAddData("Bot0", "table", True),
+        ClientMatchRequest("Bot0", "Poirot", 4, True),
+        ClientPlayerStartRequest("Bot0", 100),
+        ClientPlayerReadyData("Bot0"),
+        ClientGetGameStateRequest("Bot0"),
+        ClientPlayerDiscardCardRequest("Bot0", 3, 12),
+        ClientPlayerPlayCardRequest("Bot0", 2, 12),
+        ServerHintData("Bot0", "Bot1", "value", 1, [0, 3], "Bot1"),
+        ServerPlayerConnectionOk("Bot0"),
+        ServerPlayerStartRequestAccepted(5, 2),
+        ServerStartGameData(names, 10),
+        ServerGameStateData(
+            "Bot0",
+            4,
+            players,
+            3,
+            1,
+            table,
+            [CARDS[20], CARDS[33], CARDS[49]],
+            1500,
+            12,
+        ),
+        ServerActionValid("Bot1", "Bot0", "discard", CARDS[7], 1, 4),
+        ServerPlayerMoveOk("Bot1", "Bot0", CARDS[5], 0, 4),
+        ServerPlayerThunderStrike("Bot1", "Bot0", CARDS[45], 2, 4),
+        ServerActionInvalid("It is not your turn yet"),
+        ServerInvalidDataReceived(ClientPlayerPlayCardRequest("Bot0", 9)),
+        ServerInvalidDataReceived("colour"),
+        ServerGameOver(17, "Excellent, crowd pleasing."),
+    ]
+
+
+def benchmark(number: int = 2000) -> None:
+    """Compare bytes and time of a round trip of pickle and of the binary codec."""
+    print(
+        f"{'message':36} {'frame B':>8} {'pickle B':>9} {'codec B':>8} "
+        f"{'pickle us':>10} {'codec us':>9}"
+    )
+    for message in sample_messages():
+        old = timeit.timeit(
+            lambda: pickle_deserialize(pickle_serialize(message)), number=number
+        )
+        new = timeit.timeit(lambda: decode(encode(message)), number=number)
+        print(
+            f"{type(message).__name__:36} {len(pickle_serialize(message)):>8} "
+            f"{len(pickle.dumps(message)):>9} "
+            f"{len(encode(message)):>8} {old / number * 1e6:>10.1f} "
+            f"{new / number * 1e6:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", help="Round trips of each message", type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.number)
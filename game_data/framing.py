@@ -0,0 +1,36 @@
+from typing import List
+
+from .GameData import GameData
+
+# Each frame is the length of the payload followed by the payload (see GameData.serialize)
+HEADER_SIZE = 2
+
+
+class FrameReader:
+    """
+    FrameReader keeps the bytes received from a connection until whole frames are
+    available: a frame can arrive split in many reads and a read can contain many frames.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[GameData]:
+        """Add received `data` and return the messages completed by it."""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+        while len(buffer) - offset >= HEADER_SIZE:
+            end = (
+                offset
+                + HEADER_SIZE
+                + int.from_bytes(buffer[offset : offset + HEADER_SIZE], "little")
+            )
+            if end > len(buffer):
+                break
+            messages.append(GameData.deserialize(buffer[offset:end]))
+            offset = end
+        if offset > 0:
+            del buffer[:offset]
+        return messages
@@ -1,11 +1,15 @@
 import logging
-from copy import deepcopy
-from random import shuffle
+from random import Random
+from typing import Optional
+
+from constants import CARD_COLORS, CARD_VALUES, COLORS, DECK_SIZE
 
 from .GameData import *
 
 
 class Card(object):
+    __slots__ = ("id", "value", "color")
+
     def __init__(self, id, value, color) -> None:
         super().__init__()
         self.id = id
@@ -34,6 +38,12 @@ class Card(object):
         return self.id == other.id
 
 
+# Cards are the same for everyone and never change: games refer to them by id
+CARDS = tuple(
+    Card(id, int(CARD_VALUES[id]), COLORS[CARD_COLORS[id]]) for id in range(DECK_SIZE)
+)
+
+
 class Token(object):
     def __init__(self, type) -> None:
         super().__init__()
@@ -45,6 +55,8 @@ class Token(object):
 
 
 class Player(object):
+    __slots__ = ("name", "ready", "hand")
+
     def __init__(self, name) -> None:
         super().__init__()
         self.name = name
@@ -69,9 +81,43 @@ class Player(object):
         return "Player " + self.name + " { \n\tcards: " + c + "\n}"
 
 
-class Game(object):
+class MoveDelta(object):
+    """
+    What `Game.makeMove` changed, so that `Game.unmakeMove` can bring it back.
+    card is the card played or discarded (None for hints), position its place in hand.
+    """
+
+    __slots__ = (
+        "player",
+        "card",
+        "position",
+        "played",
+        "drawn",
+        "noteTokens",
+        "stormTokens",
+        "lastTurn",
+        "lastMoves",
+        "gameOver",
+        "score",
+    )
+
+    def __init__(
+        self, player, noteTokens, stormTokens, lastTurn, lastMoves, gameOver, score
+    ) -> None:
+        self.player = player
+        self.card = None
+        self.position = -1
+        self.played = False
+        self.drawn = False
+        self.noteTokens = noteTokens
+        self.stormTokens = stormTokens
+        self.lastTurn = lastTurn
+        self.lastMoves = lastMoves
+        self.gameOver = gameOver
+        self.score = score
+
 
-    __dataActions = {}
+class Game(object):
 
     __scoreMessages = [
         "Booooooooooooring!",
@@ -81,81 +127,20 @@ class Game(object):
         "AMAZING!",
         "YOU'RE THE BEST!",
     ]
-    __cards = []  # cards are the same for everyone
     __MAX_NOTE_TOKENS = 8
     __MAX_STORM_TOKENS = 3
     __MAX_FIREWORKS = 5
 
-    def __init__(self) -> None:
+    def __init__(self, seed: Optional[int] = None) -> None:
         super().__init__()
+        # Shuffles the deck: same seed, same sequence of decks
+        self.__random = Random(seed)
         self.__discardPile = []
         # Init cards
         self.__gameOver = False
-        if len(self.__cards) == 0:
-            numCards = 0
-            for _ in range(3):
-                self.__cards.append(Card(numCards, 1, "red"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 1, "yellow"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 1, "green"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 1, "blue"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 1, "white"))
-                numCards += 1
-            for _ in range(2):
-                self.__cards.append(Card(numCards, 2, "red"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 2, "yellow"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 2, "green"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 2, "blue"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 2, "white"))
-                numCards += 1
-            for _ in range(2):
-                self.__cards.append(Card(numCards, 3, "red"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 3, "yellow"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 3, "green"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 3, "blue"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 3, "white"))
-                numCards += 1
-            for _ in range(2):
-                self.__cards.append(Card(numCards, 4, "red"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 4, "yellow"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 4, "green"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 4, "blue"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 4, "white"))
-                numCards += 1
-            for _ in range(1):
-                self.__cards.append(Card(numCards, 5, "red"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 5, "yellow"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 5, "green"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 5, "blue"))
-                numCards += 1
-                self.__cards.append(Card(numCards, 5, "white"))
-                numCards += 1
-        self.__cardsToDraw = deepcopy(self.__cards)
-        self.__tableCards = {
-            "red": [],
-            "yellow": [],
-            "green": [],
-            "blue": [],
-            "white": [],
-        }
+        # Ids of the cards in CARDS, drawn from the end
+        self.__cardsToDraw = list(range(len(CARDS)))
+        self.__tableCards = {color: [] for color in COLORS}
 
         ###
         # Init tokens
@@ -165,6 +150,9 @@ class Game(object):
 
         # Init players
         self.__players = []
+        self.__playersByName = {}
+        # Empty players shown to themselves in game state
+        self.__hiddenPlayers = {}
         self.__currentPlayer = 0
 
         # init game
@@ -175,16 +163,36 @@ class Game(object):
         # score
         self.__score = 0
         # add actions for each class of data
-        self.__dataActions[
-            ClientPlayerDiscardCardRequest
-        ] = self.__satisfyDiscardRequest
-        self.__dataActions[
-            ClientGetGameStateRequest
-        ] = self.__satisfyShowCardRequest
-        self.__dataActions[
-            ClientPlayerPlayCardRequest
-        ] = self.__satisfyPlayCardRequest
-        self.__dataActions[ClientHintData] = self.__satisfyHintRequest
+        self.__dataActions = {
+            ClientPlayerDiscardCardRequest: self.__satisfyDiscardRequest,
+            ClientGetGameStateRequest: self.__satisfyShowCardRequest,
+            ClientPlayerPlayCardRequest: self.__satisfyPlayCardRequest,
+            ClientHintData: self.__satisfyHintRequest,
+        }
+
+    def reset(self, seed: Optional[int] = None):
+        """
+        Bring the game back to the state before `start`, keeping the same players, that
+        have to be ready again. If `seed` is given, the next shuffles of the deck are
+        seeded with it.
+        """
+        if seed is not None:
+            self.__random.seed(seed)
+        self.__cardsToDraw[:] = range(len(CARDS))
+        for pile in self.__tableCards.values():
+            pile.clear()
+        self.__discardPile.clear()
+        for p in self.__players:
+            p.hand.clear()
+            p.ready = False
+        self.__gameOver = False
+        self.__noteTokens = 0
+        self.__stormTokens = 0
+        self.__currentPlayer = 0
+        self.__started = False
+        self.__lastTurn = False
+        self.__lastMoves = 0
+        self.__score = 0
 
     # Request satisfaction methods
     # Each method produces a tuple of ServerToClientData derivates
@@ -194,7 +202,6 @@ class Game(object):
         if type(data) in self.__dataActions:
             if type(data) == ClientGetGameStateRequest:
                 data.sender = playerName
-            print("Doing something")
             result = self.__dataActions[type(data)](data)
             if type(data) != ClientGetGameStateRequest:
                 if len(self.__cardsToDraw) == 0:
@@ -205,10 +212,9 @@ class Game(object):
                 logging.info("Game over, people.")
                 logging.info("Please, close the server now")
                 logging.info(
-                    "Score: "
-                    + str(self.__score)
-                    + "; message: "
-                    + self.__scoreMessages[self.__score // len(self.__scoreMessages)]
+                    "Score: %d; message: %s",
+                    self.__score,
+                    self.__scoreMessages[self.__score // len(self.__scoreMessages)],
                 )  # ! BUGFIX index
                 # ! BUGFIX index
                 return (
@@ -234,19 +240,17 @@ class Game(object):
                     None,
                 )
             card: Card = player.hand[data.handCardOrdered]
-            if not self.__discardCard(card.id, player.name):
+            if not self.__discardCard(player, data.handCardOrdered):
                 logging.warning(
                     "Impossible discarding a card: there is no used token available"
                 )
                 return (ServerActionInvalid("You have no used tokens"), None)
             else:
-                self.__drawCard(player.name)
-                logging.info(
-                    "Player: "
-                    + self.__getCurrentPlayer().name
-                    + ": card "
-                    + str(card.id)
-                    + " discarded successfully"
+                self.__drawCard(player)
+                logging.debug(
+                    "Player: %s: card %s discarded successfully",
+                    player.name,
+                    card.id,
                 )
                 self.__nextTurn()
                 # ! ADDED last param. see GameData relative comment in ServerActionValid
@@ -266,19 +270,20 @@ class Game(object):
 
     # Show request
     def __satisfyShowCardRequest(self, data: ClientGetGameStateRequest):
-        logging.info("Showing hand to: " + data.sender)
-        currentPlayer, playerList, playerHandSize = self.__getPlayersStatus(data.sender)
-        return (
-            ServerGameStateData(
-                currentPlayer,
-                playerHandSize,
-                playerList,
-                self.__noteTokens,
-                self.__stormTokens,
-                self.__tableCards,
-                self.__discardPile,
-            ),
-            None,
+        logging.debug("Showing hand to: %s", data.sender)
+        return (self.getGameState(data.sender), None)
+
+    def getGameState(self, playerName: str) -> ServerGameStateData:
+        """The view of `playerName`: everything but their own hand."""
+        currentPlayer, playerList, playerHandSize = self.__getPlayersStatus(playerName)
+        return ServerGameStateData(
+            currentPlayer,
+            playerHandSize,
+            playerList,
+            self.__noteTokens,
+            self.__stormTokens,
+            self.__tableCards,
+            self.__discardPile,
         )
 
     # Play card request
@@ -292,9 +297,8 @@ class Game(object):
                     ServerActionInvalid("You don't have that many cards!"),
                     None,
                 )
-            card: Card = p.hand[data.handCardOrdered]
-            self.__playCard(p.name, data.handCardOrdered)
-            ok = self.__checkTableCards()
+            card: Card = self.__playCard(p, data.handCardOrdered)
+            ok = self.__checkTableCards(card.color)
             if not ok:
                 self.__nextTurn()
                 # ! ADDED last param. see GameData relative comment of ServerPlayerThunderStrike
@@ -309,15 +313,14 @@ class Game(object):
                     ),
                 )
             else:
-                logging.info(
-                    self.__getCurrentPlayer().name
-                    + ": card played and correctly put on the table"
+                logging.debug(
+                    "%s: card played and correctly put on the table", p.name
                 )
                 if card.value == 5:
-                    logging.info(card.color + " pile has been filled.")
+                    logging.debug("%s pile has been filled.", card.color)
                     if self.__noteTokens > 0:
                         self.__noteTokens -= 1
-                        logging.info("Giving 1 free note token.")
+                        logging.debug("Giving 1 free note token.")
                 self.__nextTurn()
                 # ! ADDED last param. see GameData relative comment of ServerPlayerMoveOk
                 return (
@@ -353,11 +356,7 @@ class Game(object):
                 None,
             )
         positions = []
-        destPlayer: Player = None
-        for p in self.__players:
-            if p.name == data.destination:
-                destPlayer = p
-                break
+        destPlayer: Player = self.__playersByName.get(data.destination)
         if destPlayer is None:
             return (
                 ServerInvalidDataReceived(
@@ -395,19 +394,15 @@ class Game(object):
             )
         self.__nextTurn()
         self.__noteTokens += 1
-        logging.info(
-            "Player "
-            + data.sender
-            + " providing hint to "
-            + data.destination
-            + ": cards with "
-            + data.type
-            + " "
-            + str(data.value)
-            + " are in positions: "
-            + str(positions)
+        logging.debug(
+            "Player %s providing hint to %s: cards with %s %s are in positions: %s",
+            data.sender,
+            data.destination,
+            data.type,
+            data.value,
+            positions,
         )
-        logging.info(f"Now turn of {self.__getCurrentPlayer().name}")
+        logging.debug("Now turn of %s", self.__getCurrentPlayer().name)
         # ! ADDED last param. see GameData relative comment
         return None, ServerHintData(
             data.sender,
@@ -424,19 +419,21 @@ class Game(object):
     # Player functions
     # players list. Not the best, but there are literally max 5 players and the list should give us the order of connection = the order of the rounds
     def addPlayer(self, name: str):
-        self.__players.append(Player(name))
+        player = Player(name)
+        self.__players.append(player)
+        self.__playersByName[name] = player
+        self.__hiddenPlayers[name] = Player(name)
 
     def removePlayer(self, name: str):
-        for p in self.__players:
-            if p.name == name:
-                self.__players.remove(p)
-                break
+        p = self.__playersByName.pop(name, None)
+        if p is not None:
+            self.__players.remove(p)
+            del self.__hiddenPlayers[name]
 
     def setPlayerReady(self, name: str):
-        for p in self.__players:
-            if p.name == name:
-                p.ready = True
-                break
+        p = self.__playersByName.get(name)
+        if p is not None:
+            p.ready = True
 
     def getNumReadyPlayers(self) -> int:
         count = 0
@@ -449,9 +446,18 @@ class Game(object):
         self.__currentPlayer += 1
         self.__currentPlayer %= len(self.__players)
 
-    def start(self):
+    def start(self, deck=None):
+        """
+        Deal the cards and start the game.
+        deck: the card ids in draw order, as a sequence or an array (see DeckCorpus).
+            If None the deck is shuffled.
+        """
         self.__lastMoves = len(self.__players) + 1
-        shuffle(self.__cardsToDraw)
+        if deck is None:
+            self.__random.shuffle(self.__cardsToDraw)
+        else:
+            # Cards are drawn from the end
+            self.__cardsToDraw[:] = [int(card) for card in reversed(deck)]
         if len(self.__players) < 2:
             logging.warning("Not enough players!")
             return
@@ -459,11 +465,11 @@ class Game(object):
         if len(self.__players) < 4:
             for p in self.__players:
                 for _ in range(5):
-                    p.takeCard(self.__cardsToDraw)
+                    self.__drawCard(p)
         else:
             for _ in range(4):
                 for p in self.__players:
-                    p.takeCard(self.__cardsToDraw)
+                    self.__drawCard(p)
         self.__started = True
 
     def __getPlayersStatus(self, currentPlayerName):
@@ -472,66 +478,41 @@ class Game(object):
         for p in self.__players:
             #! I WANT ALSO THE ABSOLUTE ORDER OF PLAYERS
             if p.name == currentPlayerName:  # ! we don't want to cheat
-                # ! so we build an 'empty' Player object for the requesting player
-                tmp_player = Player(currentPlayerName)
-                players.append(tmp_player)
+                # ! so we show an 'empty' Player object to the requesting player
+                players.append(self.__hiddenPlayers[currentPlayerName])
                 handSize = len(p.hand)
             else:
                 players.append(p)
         return (self.__players[self.__currentPlayer].name, players, handSize)
 
-    def __getPlayer(self, currentPlayerName: str) -> Player:
-        for p in self.__players:
-            if p.name == currentPlayerName:
-                return p
-
     def __getCurrentPlayer(self) -> Player:
         return self.__players[self.__currentPlayer]
 
-    def __discardCard(self, cardID: int, playerName: str) -> bool:
+    def __discardCard(self, player: Player, cardPosition: int) -> bool:
         if self.__noteTokens < 1:  # Ok only if you already used at least 1 token
             return False
         self.__noteTokens -= 1
-        endLoop = False
-        # find player
-        for p in self.__players:
-            if endLoop:
-                break
-            if p.name == playerName:
-                # find card
-                for card in p.hand:
-                    if endLoop:
-                        break
-                    if card.id == cardID:
-                        self.__discardPile.append(card)  # discard
-                        p.hand.remove(card)  # remove from hand
-                        endLoop = True
+        self.__discardPile.append(player.hand.pop(cardPosition))
         return True
 
-    def __drawCard(self, playerName: str):
+    def __drawCard(self, player: Player):
         if len(self.__cardsToDraw) == 0:
             return
-        card = self.__cardsToDraw.pop()
-        for p in self.__players:
-            if p.name == playerName:
-                p.hand.append(card)
-
-    def __playCard(self, playerName: str, cardPosition: int):
-        p = self.__getPlayer(playerName)
-        self.__tableCards[p.hand[cardPosition].color].append(p.hand[cardPosition])
-        p.hand.pop(cardPosition)
-        if len(self.__cardsToDraw) > 0:
-            p.hand.append(self.__cardsToDraw.pop())
-
-    def __checkTableCards(self) -> bool:
-        for cardPool in self.__tableCards:
-            if len(self.__tableCards[cardPool]) > 0 and self.__tableCards[cardPool][
-                len(self.__tableCards[cardPool]) - 1
-            ].value != len(self.__tableCards[cardPool]):
-                card = self.__tableCards[cardPool].pop()
-                self.__discardPile.append(card)
-                self.__strikeThunder()
-                return False
+        player.hand.append(CARDS[self.__cardsToDraw.pop()])
+
+    def __playCard(self, player: Player, cardPosition: int) -> Card:
+        card = player.hand.pop(cardPosition)
+        self.__tableCards[card.color].append(card)
+        self.__drawCard(player)
+        return card
+
+    def __checkTableCards(self, color: str) -> bool:
+        # Only the pile of the last played card can be wrong
+        pile = self.__tableCards[color]
+        if pile[-1].value != len(pile):
+            self.__discardPile.append(pile.pop())
+            self.__strikeThunder()
+            return False
         return True
 
     # assumes cards checked
@@ -563,3 +544,163 @@ class Game(object):
 
     def getScore(self):
         return self.__score
+
+    # Search functions
+    # Moves are applied without building any message and can be undone in reverse order
+
+    def getLegalMoves(self) -> list:
+        """The requests of the current player that makeMove would accept."""
+        if self.__gameOver:
+            return []
+        player = self.__getCurrentPlayer()
+        moves = []
+        for i in range(len(player.hand)):
+            moves.append(ClientPlayerPlayCardRequest(player.name, i))
+            if self.__noteTokens > 0:
+                moves.append(ClientPlayerDiscardCardRequest(player.name, i))
+        if self.__noteTokens < self.__MAX_NOTE_TOKENS:
+            for p in self.__players:
+                if p is player:
+                    continue
+                for color in COLORS:
+                    if any(card.color == color for card in p.hand):
+                        moves.append(
+                            ClientHintData(player.name, p.name, "color", color)
+                        )
+                for value in range(1, 6):
+                    if any(card.value == value for card in p.hand):
+                        moves.append(
+                            ClientHintData(player.name, p.name, "value", value)
+                        )
+        return moves
+
+    def makeMove(self, data: ClientToServerData) -> Optional[MoveDelta]:
+        """
+        Apply play, discard or hint request `data` as satisfyRequest would do.
+        Returns the delta to pass to unmakeMove, or None if the move is not valid
+        (in that case nothing changes).
+        """
+        player = self.__getCurrentPlayer()
+        if self.__gameOver or player.name != data.sender:
+            return None
+        delta = MoveDelta(
+            self.__currentPlayer,
+            self.__noteTokens,
+            self.__stormTokens,
+            self.__lastTurn,
+            self.__lastMoves,
+            self.__gameOver,
+            self.__score,
+        )
+        if type(data) is ClientHintData:
+            if self.__noteTokens == self.__MAX_NOTE_TOKENS:
+                return None
+            destPlayer = self.__playersByName.get(data.destination)
+            if destPlayer is None or destPlayer is player:
+                return None
+            if data.type == "color" or data.type == "colour":
+                touched = any(card.color == data.value for card in destPlayer.hand)
+            elif data.type == "value":
+                touched = any(card.value == data.value for card in destPlayer.hand)
+            else:
+                return None
+            if not touched:
+                return None
+            self.__noteTokens += 1
+        elif type(data) in (
+            ClientPlayerPlayCardRequest,
+            ClientPlayerDiscardCardRequest,
+        ):
+            position = data.handCardOrdered
+            if position >= len(player.hand) or position < 0:
+                return None
+            if type(data) is ClientPlayerDiscardCardRequest:
+                if self.__noteTokens < 1:
+                    return None
+                self.__noteTokens -= 1
+                card = player.hand.pop(position)
+                self.__discardPile.append(card)
+            else:
+                card = player.hand.pop(position)
+                pile = self.__tableCards[card.color]
+                if card.value == len(pile) + 1:
+                    pile.append(card)
+                    delta.played = True
+                    if card.value == 5 and self.__noteTokens > 0:
+                        self.__noteTokens -= 1
+                else:
+                    self.__discardPile.append(card)
+                    self.__strikeThunder()
+            delta.card = card
+            delta.position = position
+            delta.drawn = len(self.__cardsToDraw) > 0
+            self.__drawCard(player)
+        else:
+            return None
+        self.__nextTurn()
+        if len(self.__cardsToDraw) == 0:
+            self.__lastTurn = True
+            self.__lastMoves -= 1
+        self.__gameOver, self.__score = self.__checkGameEnded()
+        return delta
+
+    def unmakeMove(self, delta: MoveDelta):
+        """Undo the last move applied with makeMove."""
+        if delta.card is not None:
+            player = self.__players[delta.player]
+            if delta.drawn:
+                self.__cardsToDraw.append(player.hand.pop().id)
+            if delta.played:
+                self.__tableCards[delta.card.color].pop()
+            else:
+                self.__discardPile.pop()
+            player.hand.insert(delta.position, delta.card)
+        self.__currentPlayer = delta.player
+        self.__noteTokens = delta.noteTokens
+        self.__stormTokens = delta.stormTokens
+        self.__lastTurn = delta.lastTurn
+        self.__lastMoves = delta.lastMoves
+        self.__gameOver = delta.gameOver
+        self.__score = delta.score
+
+    def snapshot(self) -> tuple:
+        """An immutable copy of the whole game state, to compare states."""
+        return (
+            tuple(self.__cardsToDraw),
+            tuple(tuple(card.id for card in p.hand) for p in self.__players),
+            tuple(
+                tuple(card.id for card in pile) for pile in self.__tableCards.values()
+            ),
+            tuple(card.id for card in self.__discardPile),
+            self.__noteTokens,
+            self.__stormTokens,
+            self.__currentPlayer,
+            self.__lastTurn,
+            self.__lastMoves,
+            self.__gameOver,
+            self.__score,
+        )
+
+
+def checkMakeUnmake(game: Game, sequences: int, length: int, seed=None):
+    """
+    Play `sequences` random sequences of at most `length` legal moves from the current
+    state of `game`, then undo them. Raise AssertionError if any undo does not restore
+    the exact state before the move.
+    """
+    rng = Random(seed)
+    initial = game.snapshot()
+    for _ in range(sequences):
+        history = []
+        for _ in range(length):
+            moves = game.getLegalMoves()
+            if len(moves) == 0:
+                break
+            before = game.snapshot()
+            delta = game.makeMove(rng.choice(moves))
+            assert delta is not None, "Legal move refused"
+            history.append((before, delta))
+        for before, delta in reversed(history):
+            game.unmakeMove(delta)
+            assert game.snapshot() == before, "Undo does not restore the state"
+        assert game.snapshot() == initial
@@ -0,0 +1,254 @@
+import asyncio
+import socket
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Sequence, Tuple
+
+# Bytes of each ring, enough for thousands of frames
+RING_SIZE = 1 << 20
+# How long a reader sleeps before checking its ring again, in case a wakeup was lost
+POLL_INTERVAL = 0.05
+
+# Header of a ring: head and tail (8 bytes each) count the bytes written and read,
+# then a flag set by a reader that is going to sleep until the writer sends a wakeup
+# byte on the control socket
+_HEADER_SIZE = 24
+
+
+class Ring:
+    """
+    Ring is a byte stream from a single writer to a single reader, in shared memory.
+    Frames are written as they are, so the reader splits them with a FrameReader.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory) -> None:
+        self.shm = shm
+        self.data = shm.buf[_HEADER_SIZE:]
+        self.capacity = len(self.data)
+        self.counters = shm.buf[:16].cast("Q")
+
+    @classmethod
+    def create(cls, size: int = RING_SIZE) -> "Ring":
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + size)
+        shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str) -> "Ring":
+        shm = shared_memory.SharedMemory(name)
+        # The creator owns the segment: do not let this process unlink it at exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    @property
+    def waiting(self) -> bool:
+        return self.shm.buf[16] != 0
+
+    @waiting.setter
+    def waiting(self, value: bool) -> None:
+        self.shm.buf[16] = 1 if value else 0
+
+    def write(self, payload: bytes) -> int:
+        """Copy as much of `payload` as fits, returns the bytes written."""
+        head, tail = self.counters[0], self.counters[1]
+        count = min(len(payload), self.capacity - (head - tail))
+        start = head % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start : start + first] = payload[:first]
+        self.data[: count - first] = payload[first:count]
+        # Published only when the bytes are in place
+        self.counters[0] = head + count
+        return count
+
+    def read(self, size: int) -> bytes:
+        """Take at most `size` bytes, nothing if the ring is empty."""
+        head, tail = self.counters[0], self.counters[1]
+        count = min(size, head - tail)
+        if count == 0:
+            return b""
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        data = bytes(self.data[start : start + first]) + bytes(
+            self.data[: count - first]
+        )
+        self.counters[1] = tail + count
+        return data
+
+    def close(self) -> None:
+        self.data.release()
+        self.counters.release()
+        self.shm.close()
+
+
+class ShmSocket:
+    """
+    ShmSocket is the client side of a shared memory connection, with the methods of a
+    blocking socket used by `Player`.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.control.connect(path)
+        self.outgoing = Ring.create()
+        self.incoming = Ring.create()
+        self.control.sendall(
+            f"SHM {self.outgoing.shm.name} {self.incoming.shm.name}\n".encode()
+        )
+        if self.control.recv(1) != b"K":
+            raise ConnectionRefusedError(f"Shared memory refused by {path}")
+        # Both processes have them mapped: the names are not needed anymore
+        self.outgoing.shm.unlink()
+        self.incoming.shm.unlink()
+        self.control.settimeout(POLL_INTERVAL)
+
+    def sendall(self, data: bytes) -> None:
+        data = memoryview(data)
+        while len(data) > 0:
+            written = self.outgoing.write(data)
+            data = data[written:]
+            if self.outgoing.waiting:
+                self.control.sendall(b"\0")
+            if len(data) > 0:
+                time.sleep(0.0005)
+
+    def recv(self, size: int) -> bytes:
+        while True:
+            data = self.incoming.read(size)
+            if data:
+                return data
+            self.incoming.waiting = True
+            data = self.incoming.read(size)
+            if data:
+                self.incoming.waiting = False
+                return data
+            try:
+                if not self.control.recv(64):
+                    return b""
+            except socket.timeout:
+                pass
+            except OSError:
+                return b""
+            self.incoming.waiting = False
+
+    def shutdown(self, how: int) -> None:
+        self.control.shutdown(how)
+
+    def close(self) -> None:
+        self.control.close()
+        self.outgoing.close()
+        self.incoming.close()
+
+
+class ShmStreamReader:
+    """Reader of a shared memory connection, like `asyncio.StreamReader`."""
+
+    def __init__(self, ring: Ring, control: asyncio.StreamReader) -> None:
+        self.ring = ring
+        self.control = control
+
+    async def read(self, size: int) -> bytes:
+        while True:
+            data = self.ring.read(size)
+            if data:
+                return data
+            self.ring.waiting = True
+            data = self.ring.read(size)
+            if data:
+                self.ring.waiting = False
+                return data
+            try:
+                if not await asyncio.wait_for(self.control.read(64), POLL_INTERVAL):
+                    return b""
+            except asyncio.TimeoutError:
+                pass
+            self.ring.waiting = False
+
+
+class ShmStreamWriter:
+    """
+    Writer of a shared memory connection, like `asyncio.StreamWriter`. The rings in
+    `owned` are closed with the connection.
+    """
+
+    def __init__(
+        self, ring: Ring, control: asyncio.StreamWriter, owned: Sequence[Ring] = ()
+    ) -> None:
+        self.ring = ring
+        self.control = control
+        self.owned = owned
+        self.transport = control.transport
+        self.pending = bytearray()
+
+    def get_extra_info(self, name: str, default=None):
+        return "shm" if name == "peername" else default
+
+    def _flush(self) -> None:
+        if self.pending:
+            written = self.ring.write(self.pending)
+            del self.pending[:written]
+        if self.ring.waiting and not self.control.is_closing():
+            self.control.write(b"\0")
+
+    def writelines(self, frames: List[bytes]) -> None:
+        for frame in frames:
+            self.pending += frame
+        self._flush()
+
+    def write(self, frame: bytes) -> None:
+        self.writelines([frame])
+
+    async def drain(self) -> None:
+        while self.pending:
+            if self.control.is_closing():
+                raise ConnectionResetError("Shared memory connection closed")
+            await asyncio.sleep(0.001)
+            self._flush()
+
+    def close(self) -> None:
+        self.control.close()
+        for ring in self.owned:
+            ring.close()
+        self.owned = ()
+
+
+async def open_shm_connection(
+    path: str,
+) -> Tuple[ShmStreamReader, ShmStreamWriter]:
+    """Client side of a shared memory connection from an event loop, see `ShmSocket`."""
+    reader, writer = await asyncio.open_unix_connection(path)
+    outgoing = Ring.create()
+    incoming = Ring.create()
+    writer.write(f"SHM {outgoing.shm.name} {incoming.shm.name}\n".encode())
+    if await reader.read(1) != b"K":
+        writer.close()
+        outgoing.close()
+        incoming.close()
+        raise ConnectionRefusedError(f"Shared memory refused by {path}")
+    outgoing.shm.unlink()
+    incoming.shm.unlink()
+    return (
+        ShmStreamReader(incoming, reader),
+        ShmStreamWriter(outgoing, writer, (outgoing, incoming)),
+    )
+
+
+def shm_handler(handler):
+    """Wrap `handler` of the server to accept shared memory connections."""
+
+    async def accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = (await reader.readline()).split()
+        if len(hello) != 3 or hello[0] != b"SHM":
+            writer.close()
+            return
+        incoming = Ring.attach(hello[1].decode())
+        outgoing = Ring.attach(hello[2].decode())
+        writer.write(b"K")
+        try:
+            await handler(
+                ShmStreamReader(incoming, reader), ShmStreamWriter(outgoing, writer)
+            )
+        finally:
+            incoming.close()
+            outgoing.close()
+
+    return accept
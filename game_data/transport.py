@@ -0,0 +1,119 @@
+import asyncio
+import socket
+from typing import Awaitable, Callable, Dict, Tuple
+from urllib.parse import urlsplit
+
+from . import shm_transport
+
+# Called by the server for each connection
+Handler = Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]
+
+# In-process servers by name, with the loop they run in
+_memoryServers = {}  # type: Dict[str, Tuple[asyncio.AbstractEventLoop, Handler]]
+
+
+def tcp_url(host: str, port: int) -> str:
+    return f"tcp://{host}:{port}"
+
+
+def _split(url: str) -> Tuple[str, str]:
+    """Split `url` in scheme and address (host:port, path or name)."""
+    parts = urlsplit(url)
+    if parts.scheme == "tcp":
+        return "tcp", parts.netloc
+    if parts.scheme == "unix":
+        return "unix", parts.netloc + parts.path
+    if parts.scheme == "memory":
+        return "memory", parts.netloc + parts.path
+    if parts.scheme == "shm":
+        return "shm", parts.netloc + parts.path
+    raise ValueError(
+        f"Unknown transport in {url}: use tcp://, unix://, shm:// or memory://"
+    )
+
+
+def connect(url: str):
+    """
+    Open a blocking connection to the server at `url`:
+    - tcp://host:port, with Nagle disabled since messages are small;
+    - unix:///path, a Unix domain socket for bots on the same host;
+    - shm:///path, rings in shared memory for bots on the same host, the Unix domain
+      socket at path is only used to set them up and to wake up the other side;
+    - memory://name, a socket pair with a server running in this process.
+    """
+    scheme, address = _split(url)
+    if scheme == "tcp":
+        host, port = address.rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    if scheme == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+        return sock
+    if scheme == "shm":
+        return shm_transport.ShmSocket(address)
+    if address not in _memoryServers:
+        raise ConnectionRefusedError(f"No server at {url}")
+    loop, handler = _memoryServers[address]
+    client, server = socket.socketpair()
+
+    async def accept():
+        reader, writer = await asyncio.open_connection(sock=server)
+        await handler(reader, writer)
+
+    loop.call_soon_threadsafe(lambda: loop.create_task(accept()))
+    return client
+
+
+async def open_connection(
+    url: str,
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a connection to the server at `url` from an event loop (not memory://)."""
+    scheme, address = _split(url)
+    if scheme == "tcp":
+        host, port = address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.transport.get_extra_info("socket").setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        return reader, writer
+    if scheme == "unix":
+        return await asyncio.open_unix_connection(address)
+    if scheme == "shm":
+        return await shm_transport.open_shm_connection(address)
+    raise ValueError(
+        f"Cannot open {url} from an event loop: use tcp://, unix:// or shm://"
+    )
+
+
+class _MemoryServer:
+    """Registration of an in-process server, closed like the others."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def close(self) -> None:
+        _memoryServers.pop(self.name, None)
+
+    async def wait_closed(self) -> None:
+        pass
+
+
+async def serve(url: str, handler: Handler):
+    """Accept connections at `url` (see `connect`) and serve each with `handler`."""
+    scheme, address = _split(url)
+    if scheme == "tcp":
+        host, port = address.rsplit(":", 1)
+        # asyncio disables Nagle on accepted TCP sockets
+        return await asyncio.start_server(
+            handler, host, int(port), reuse_address=True
+        )
+    if scheme == "unix":
+        return await asyncio.start_unix_server(handler, address)
+    if scheme == "shm":
+        return await asyncio.start_unix_server(
+            shm_transport.shm_handler(handler), address
+        )
+    _memoryServers[address] = (asyncio.get_running_loop(), handler)
+    return _MemoryServer(address)
@@ -0,0 +1,124 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .batch_game import BatchGame
+
+
+class ObservationLayout:
+    """
+    Position of each feature in the observation of a seat. All values are int8.
+
+    hands       card ids of the other players, starting from the next seat (-1 if empty)
+    fireworks   height of the firework of each color
+    discards    discarded cards, rows are colors and columns are (values - 1)
+    tokens      used note tokens, used storm tokens
+    turn        seats between the observer and the current player
+    knowledge   can_be masks (color x value) of each card, starting from the observer
+    """
+
+    def __init__(self, num_players: int) -> None:
+        self.num_players = num_players
+        self.hand_size = 5 if num_players < 4 else 4
+        sizes = [
+            ("hands", (num_players - 1) * self.hand_size),
+            ("fireworks", 5),
+            ("discards", 25),
+            ("tokens", 2),
+            ("turn", 1),
+            ("knowledge", num_players * self.hand_size * 25),
+        ]
+        offset = 0
+        for name, size in sizes:
+            setattr(self, name, slice(offset, offset + size))
+            offset += size
+        self.size = offset
+
+
+class HanabiVectorEnv:
+    """
+    HanabiVectorEnv runs `num_envs` games at once with a reset/step interface.
+
+    Observations have shape (envs, players, layout.size), one row for each seat seen from
+    that seat (see `ObservationLayout`). Actions follow the encoding of `BatchGame` and
+    are made by `current_player`. Rewards are the change of score, so a game lost with
+    the third storm token gives back all the points. Ended games are started again in the
+    same step: their last score is in `final_scores`.
+
+    The observations array is reused: it is overwritten by the next call.
+    """
+
+    def __init__(
+        self, num_envs: int, num_players: int, seed: Optional[int] = None
+    ) -> None:
+        self.game = BatchGame(num_envs, num_players, np.random.default_rng(seed))
+        self.num_envs = num_envs
+        self.num_players = num_players
+        self.num_actions = self.game.num_actions
+        self.layout = ObservationLayout(num_players)
+        self.final_scores = np.zeros(num_envs, dtype=np.uint8)
+        self._observations = np.zeros(
+            [num_envs, num_players, self.layout.size], dtype=np.int8
+        )
+        self._scores = np.zeros(num_envs, dtype=np.int16)
+
+    @property
+    def current_player(self) -> np.ndarray:
+        return self.game.current
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Start new games. Returns observations and legal actions masks."""
+        self.game.reset()
+        self._scores.fill(0)
+        return self._observe(), self.game.legal_actions()
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Apply `actions` of the current players.
+
+        Returns
+        -------
+        observations: np.ndarray
+            (envs, players, layout.size)
+        legal: np.ndarray
+            (envs, num_actions) legal actions of the next current players
+        rewards: np.ndarray
+            (envs,) change of score
+        dones: np.ndarray
+            (envs,) True if the game ended (and was started again)
+        """
+        done, score = self.game.step(actions)
+        dones = done.copy()
+        scores = np.where(
+            dones, score, np.sum(self.game.fireworks, axis=1, dtype=np.int16)
+        )
+        rewards = (scores - self._scores).astype(np.float32)
+        self._scores[:] = scores
+        if np.any(dones):
+            self.final_scores[dones] = score[dones]
+            self.game.reset(mask=dones)
+            self._scores[dones] = 0
+        return self._observe(), self.game.legal_actions(), rewards, dones
+
+    def _observe(self) -> np.ndarray:
+        game = self.game
+        layout = self.layout
+        obs = self._observations
+        obs[:, :, layout.fireworks] = game.fireworks[:, None]
+        obs[:, :, layout.discards] = game.discards.reshape(self.num_envs, 1, 25)
+        obs[:, :, layout.tokens.start] = game.note_tokens[:, None]
+        obs[:, :, layout.tokens.start + 1] = game.storm_tokens[:, None]
+        for seat in range(self.num_players):
+            order = (np.arange(self.num_players) + seat) % self.num_players
+            obs[:, seat, layout.hands] = game.hands[:, order[1:]].reshape(
+                self.num_envs, -1
+            )
+            obs[:, seat, layout.turn] = ((game.current - seat) % self.num_players)[
+                :, None
+            ]
+            obs[:, seat, layout.knowledge] = game.knowledge[:, order].reshape(
+                self.num_envs, -1
+            )
+        return obs
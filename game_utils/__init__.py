@@ -1,3 +1,7 @@
 from .table import Table
 from .card_knowledge import CardKnowledge
 from .mutator import Mutator
+from .seeding import Seed, game_seed, spawn_seeds
+from .observation import ObservationEncoder
+from .endgame import EndgameMove, EndgameSolver, sample_hands
+from .zobrist import ZobristHash
@@ -0,0 +1,55 @@
+import argparse
+
+import numpy as np
+
+from constants import DECK_SIZE
+
+from .seeding import Seed
+
+
+class DeckCorpus:
+    """
+    DeckCorpus gives random access to pre-shuffled decks stored in a .npy file, without
+    loading it in memory.
+
+    Each row is a deck of 50 card ids (see `constants.CARD_VALUES`) in draw order:
+    `Game.start(deck)` and `BatchGame.reset(decks)` accept rows as they are.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.decks = np.load(filename, mmap_mode="r")
+        if self.decks.dtype != np.uint8 or self.decks.shape[1:] != (DECK_SIZE,):
+            raise ValueError(f"{filename} is not a deck corpus")
+
+    def __len__(self) -> int:
+        return self.decks.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        """Deck `key` (or a slice of decks) as a read-only view of the file."""
+        return self.decks[key]
+
+
+def write_deck_corpus(
+    filename: str, decks: int, seed: Seed = None, chunk_size: int = 1 << 16
+) -> None:
+    """Shuffle `decks` decks with `seed` and write them to `filename`, a chunk at time."""
+    rng = np.random.default_rng(seed)
+    corpus = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=np.uint8, shape=(decks, DECK_SIZE)
+    )
+    ordered = np.arange(DECK_SIZE, dtype=np.uint8)
+    for start in range(0, decks, chunk_size):
+        count = min(chunk_size, decks - start)
+        corpus[start : start + count] = rng.permuted(
+            np.tile(ordered, (count, 1)), axis=1
+        )
+    corpus.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename", help="Output .npy file", type=str)
+    parser.add_argument("--decks", help="Number of decks", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    write_deck_corpus(args.filename, args.decks, args.seed)
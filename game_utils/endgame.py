@@ -0,0 +1,217 @@
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EndgameMove = namedtuple("EndgameMove", ["action", "card_index", "expected_score"])
+
+# Cards are (color index) * 5 + (value - 1)
+Hand = Tuple[int, ...]
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def sample_hands(
+    can_be: Sequence[np.ndarray],
+    unseen: np.ndarray,
+    count: int,
+    rng: np.random.Generator,
+    max_tries: int = 1000,
+) -> List[Hand]:
+    """
+    Sample up to `count` hands compatible with the `can_be` mask of each card (rows are
+    colors, columns are values - 1) and with the `unseen` count of each card. Likely
+    hands are drawn more often, so they are repeated in the samples.
+    """
+    hands = []  # type: List[Hand]
+    for _ in range(max_tries):
+        remaining = unseen.astype(np.int64).ravel()
+        hand = []
+        for mask in can_be:
+            weights = remaining * mask.ravel()
+            total = weights.sum()
+            if total == 0:
+                break
+            card = rng.choice(25, p=weights / total)
+            remaining[card] -= 1
+            hand.append(int(card))
+        else:
+            hands.append(tuple(hand))
+            if len(hands) == count:
+                break
+    return hands
+
+
+class EndgameSolver:
+    """
+    EndgameSolver searches exhaustively the moves left after the deck is empty, when no
+    card is drawn anymore and each player has at most one more turn.
+
+    Every sampled hand of the current player gives a game with perfect information that
+    is solved with memoization; moves are then ranked by their mean final score.
+    Hints are not distinguished: in the last round they only spend a note token.
+
+    Attributes
+    ----------
+    fireworks: Tuple[int, ...]
+        Height of the firework of each color.
+    hands: List[Optional[Hand]]
+        Hand of each player in turn order, starting from the one that has to move
+        (their hand is None, it is sampled).
+    note_tokens: int
+        Used note tokens.
+    storm_tokens: int
+        Used storm tokens.
+    moves_left: int
+        Moves to play before the end of the game.
+    """
+
+    MAX_NOTE_TOKENS = 8
+    MAX_STORM_TOKENS = 3
+
+    def __init__(
+        self,
+        fireworks: Sequence[int],
+        hands: List[Optional[Hand]],
+        note_tokens: int,
+        storm_tokens: int,
+        moves_left: int,
+    ) -> None:
+        self.fireworks = tuple(int(f) for f in fireworks)
+        self.hands = hands
+        self.note_tokens = note_tokens
+        self.storm_tokens = storm_tokens
+        self.moves_left = moves_left
+        self._memo = {}  # type: Dict[tuple, int]
+        self._deadline = 0.0
+        self._nodes = 0
+
+    def solve(
+        self, own_samples: List[Hand], time_budget: float
+    ) -> Optional[EndgameMove]:
+        """
+        Select the move with the best expected final score over `own_samples`.
+        Samples are evaluated until `time_budget` seconds are spent: None if not even one
+        sample was solved in time.
+        """
+        self._deadline = time.perf_counter() + time_budget
+        totals = {}  # type: Dict[Tuple[str, int], float]
+        solved = 0
+        for own in own_samples:
+            hands = (own,) + tuple(self.hands[1:])
+            try:
+                values = {
+                    move: self._value(*state)
+                    for move, state in self._moves(
+                        0,
+                        self.moves_left,
+                        self.fireworks,
+                        self.note_tokens,
+                        self.storm_tokens,
+                        hands,
+                    )
+                }
+            except _OutOfTime:
+                break
+            # Moves are generated once for equal cards: give each copy the same value
+            first = {}  # type: Dict[int, int]
+            for i, card in enumerate(own):
+                j = first.setdefault(card, i)
+                for action in ("play", "discard"):
+                    if (action, j) in values:
+                        values[(action, i)] = values[(action, j)]
+            for move, value in values.items():
+                totals[move] = totals.get(move, 0.0) + value
+            solved += 1
+        if solved == 0 or len(totals) == 0:
+            return None
+        # On ties prefer hints, then plays: moves are generated in this order
+        best = max(totals, key=lambda move: totals[move])
+        return EndgameMove(best[0], best[1], totals[best] / solved)
+
+    def _moves(self, turn, moves_left, fireworks, notes, storms, hands):
+        """Yield ((action, card index), next state) for the player of `turn`."""
+        players = len(hands)
+        next_turn = (turn + 1) % players
+        hand = hands[turn]
+        if notes < self.MAX_NOTE_TOKENS and any(
+            len(h) > 0 for i, h in enumerate(hands) if i != turn
+        ):
+            yield ("hint", -1), (
+                next_turn,
+                moves_left - 1,
+                fireworks,
+                notes + 1,
+                storms,
+                hands,
+            )
+        seen = set()
+        for i, card in enumerate(hand):
+            if card in seen:
+                continue
+            seen.add(card)
+            new_hands = hands[:turn] + (hand[:i] + hand[i + 1 :],) + hands[turn + 1 :]
+            color, value = divmod(card, 5)
+            if fireworks[color] == value:
+                new_fireworks = fireworks[:color] + (value + 1,) + fireworks[color + 1 :]
+                refund = 1 if value == 4 and notes > 0 else 0
+                yield ("play", i), (
+                    next_turn,
+                    moves_left - 1,
+                    new_fireworks,
+                    notes - refund,
+                    storms,
+                    new_hands,
+                )
+            else:
+                yield ("play", i), (
+                    next_turn,
+                    moves_left - 1,
+                    fireworks,
+                    notes,
+                    storms + 1,
+                    new_hands,
+                )
+        if notes > 0:
+            seen.clear()
+            for i, card in enumerate(hand):
+                if card in seen:
+                    continue
+                seen.add(card)
+                new_hands = (
+                    hands[:turn] + (hand[:i] + hand[i + 1 :],) + hands[turn + 1 :]
+                )
+                yield ("discard", i), (
+                    next_turn,
+                    moves_left - 1,
+                    fireworks,
+                    notes - 1,
+                    storms,
+                    new_hands,
+                )
+
+    def _value(self, turn, moves_left, fireworks, notes, storms, hands) -> int:
+        """Best final score reachable from the given state."""
+        if storms == self.MAX_STORM_TOKENS:
+            return 0
+        score = sum(fireworks)
+        if moves_left == 0:
+            return score
+        key = (turn, moves_left, fireworks, notes, storms, hands)
+        if key in self._memo:
+            return self._memo[key]
+        self._nodes += 1
+        if self._nodes % 1024 == 0 and time.perf_counter() > self._deadline:
+            raise _OutOfTime()
+        # Each move can add at most a card to the fireworks
+        bound = min(25, score + moves_left)
+        best = score
+        for _, state in self._moves(turn, moves_left, fireworks, notes, storms, hands):
+            best = max(best, self._value(*state))
+            if best == bound:
+                break
+        self._memo[key] = best
+        return best
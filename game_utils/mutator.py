@@ -2,15 +2,22 @@ from typing import Dict
 
 import numpy as np
 
+from .seeding import Seed
+
 
 class Mutator:
-    def __init__(self, starting_variance: float, params_count: int) -> None:
+    def __init__(
+        self,
+        starting_variance: float,
+        params_count: int,
+        seed: Seed = None,
+    ) -> None:
         self.params_count = params_count
         self.variance = starting_variance
         self.lr = 1 / np.sqrt(params_count)
         self.last_params = ({}, -1.0)
         self.active = True
-        self.rng = np.random.default_rng()
+        self.rng = np.random.default_rng(seed)
 
     def activate(self, active: bool):
         self.active = active
@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import game_data
+from constants import COLORS
+from game_data import ObservationLayout
+
+from .card_knowledge import CardKnowledge
+
+
+class ObservationEncoder:
+    """
+    ObservationEncoder writes the view of `player_name` in a fixed-size int8 array, with
+    the same layout of `HanabiVectorEnv` observations (see `ObservationLayout`).
+
+    Attributes
+    ----------
+    players: List[str]
+        The players in turn order.
+    player_name: str
+        The observer.
+    layout: ObservationLayout
+        Where each feature is written.
+    """
+
+    def __init__(self, players: List[str], player_name: str) -> None:
+        self.players = players
+        self.player_name = player_name
+        self.layout = ObservationLayout(len(players))
+        seat = players.index(player_name)
+        # Players starting from the observer
+        self._order = players[seat:] + players[:seat]
+        self._seats = {name: i for i, name in enumerate(self._order)}
+
+    @property
+    def size(self) -> int:
+        return self.layout.size
+
+    def encode(
+        self,
+        infos: game_data.ServerGameStateData,
+        knowledge: Dict[str, List[CardKnowledge]],
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Encode game state `infos` and `knowledge` of each player in `out`.
+        A new array is created only if `out` is None.
+        """
+        layout = self.layout
+        if out is None:
+            out = np.empty(layout.size, dtype=np.int8)
+        hands = out[layout.hands].reshape(-1, layout.hand_size)
+        hands.fill(-1)
+        for player in infos.players:
+            seat = self._seats[player.name]
+            if seat == 0:
+                continue
+            for i, card in enumerate(player.hand):
+                hands[seat - 1, i] = card.id
+        fireworks = out[layout.fireworks]
+        for i, color in enumerate(COLORS):
+            fireworks[i] = len(infos.tableCards[color])
+        discards = out[layout.discards].reshape(5, 5)
+        discards.fill(0)
+        for card in infos.discardPile:
+            discards[COLORS.index(card.color), card.value - 1] += 1
+        out[layout.tokens] = (infos.usedNoteTokens, infos.usedStormTokens)
+        out[layout.turn] = self._seats[infos.currentPlayer]
+        can_be = out[layout.knowledge].reshape(-1, layout.hand_size, 5, 5)
+        can_be.fill(1)
+        for seat, name in enumerate(self._order):
+            for i, card_knowledge in enumerate(knowledge.get(name, [])):
+                can_be[seat, i] = card_knowledge.can_be
+        return out
@@ -0,0 +1,19 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+Seed = Union[None, int, np.random.SeedSequence]
+
+
+def spawn_seeds(seed: Seed, count: int) -> List[np.random.SeedSequence]:
+    """Create `count` independent and reproducible streams (one for each worker, table or game)."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(count)
+
+
+def game_seed(seed: Seed) -> Optional[int]:
+    """Convert `seed` to the integer seed accepted by `game_data.Game`."""
+    if isinstance(seed, np.random.SeedSequence):
+        return int(seed.generate_state(1, np.uint64)[0])
+    return seed
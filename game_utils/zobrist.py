@@ -0,0 +1,197 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Cards are (color index) * 5 + (value - 1)
+MAX_PLAYERS = 5
+MAX_HAND_SIZE = 5
+_MASK = (1 << 64) - 1
+_FULL_KNOWLEDGE = (1 << 25) - 1
+_BITS = 1 << np.arange(25, dtype=np.int64)
+
+
+def _keys(rng: np.random.Generator, *shape: int) -> list:
+    return rng.integers(0, _MASK, size=shape, dtype=np.uint64, endpoint=True).tolist()
+
+
+# Fixed seed: hashes of different bots and processes are comparable
+_rng = np.random.default_rng(0x4A7AB1)
+# Each feature has a key for its card and a key for its value only: the latter are
+# xored in the hash of the color, used by the canonical form
+_CARD = _keys(_rng, MAX_PLAYERS, MAX_HAND_SIZE, 25)
+_CARD_VALUE = _keys(_rng, MAX_PLAYERS, MAX_HAND_SIZE, 5)
+_KNOWLEDGE = _keys(_rng, MAX_PLAYERS, MAX_HAND_SIZE, 25)
+_KNOWLEDGE_VALUE = _keys(_rng, MAX_PLAYERS, MAX_HAND_SIZE, 5)
+_PLAYED = _keys(_rng, 25)
+_PLAYED_VALUE = _keys(_rng, 5)
+_DISCARDED = _keys(_rng, 25, 3)
+_DISCARDED_VALUE = _keys(_rng, 5, 3)
+_NOTES = _keys(_rng, 9)
+_STORMS = _keys(_rng, 4)
+_TURN = _keys(_rng, MAX_PLAYERS)
+del _rng
+
+
+def _mix(x: int) -> int:
+    """Finalizer of splitmix64."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+class ZobristHash:
+    """
+    ZobristHash is a 64-bit key of the view of a player, updated incrementally by the
+    game events instead of being rebuilt from the whole state each turn.
+
+    The view is made of fireworks, discard pile, tokens, current player, cards in the
+    hands of the other players and the `CardKnowledge` of each card.
+    Seats are indexes in the turn order and slots are positions in the hand.
+
+    Attributes
+    ----------
+    value: int
+        The hash of the current view.
+    """
+
+    def __init__(self) -> None:
+        self.reset(0, 0)
+
+    def reset(self, players: int, hand_size: int) -> None:
+        """Set the view at the start of a game: nothing is known of the dealt cards."""
+        self.value = 0
+        # Part of the hash without colors and part of each color, for the canonical form
+        self._free = 0
+        self._colors = [0] * 5
+        self._fireworks = [0] * 5
+        self._discards = [0] * 25
+        self._notes = 0
+        self._storms = 0
+        self._turn = 0
+        self._hands = [
+            [None] * MAX_HAND_SIZE for _ in range(players)
+        ]  # type: List[List[Optional[int]]]
+        self._knowledge = [[0] * MAX_HAND_SIZE for _ in range(players)]
+        self._xor_free(_NOTES[0] ^ _STORMS[0] ^ _TURN[0])
+        for seat in range(players):
+            for slot in range(hand_size):
+                self._set_mask(seat, slot, _FULL_KNOWLEDGE)
+
+    def canonical(self) -> int:
+        """Hash of the view that is the same for every permutation of the colors."""
+        value = self._free
+        for part in sorted(self._colors):
+            value = _mix(value ^ part)
+        return value
+
+    def _xor_free(self, key: int) -> None:
+        self.value ^= key
+        self._free ^= key
+
+    def _flip(self, keys: list, value_keys: list, card: int) -> None:
+        color, value = divmod(card, 5)
+        self.value ^= keys[card]
+        self._colors[color] ^= value_keys[value]
+
+    def _flip_discard(self, card: int, copy: int) -> None:
+        color, value = divmod(card, 5)
+        self.value ^= _DISCARDED[card][copy]
+        self._colors[color] ^= _DISCARDED_VALUE[value][copy]
+
+    def _set_card(self, seat: int, slot: int, card: Optional[int]) -> None:
+        old = self._hands[seat][slot]
+        if old == card:
+            return
+        if old is not None:
+            self._flip(_CARD[seat][slot], _CARD_VALUE[seat][slot], old)
+        if card is not None:
+            self._flip(_CARD[seat][slot], _CARD_VALUE[seat][slot], card)
+        self._hands[seat][slot] = card
+
+    def _set_mask(self, seat: int, slot: int, mask: int) -> None:
+        changed = self._knowledge[seat][slot] ^ mask
+        keys = _KNOWLEDGE[seat][slot]
+        value_keys = _KNOWLEDGE_VALUE[seat][slot]
+        while changed:
+            bit = changed & -changed
+            self._flip(keys, value_keys, bit.bit_length() - 1)
+            changed ^= bit
+        self._knowledge[seat][slot] = mask
+
+    def set_turn(self, seat: int) -> None:
+        self._xor_free(_TURN[self._turn] ^ _TURN[seat])
+        self._turn = seat
+
+    def set_tokens(self, notes: int, storms: int) -> None:
+        """Set used note and storm tokens."""
+        self._xor_free(
+            _NOTES[self._notes] ^ _NOTES[notes] ^ _STORMS[self._storms] ^ _STORMS[storms]
+        )
+        self._notes = notes
+        self._storms = storms
+
+    def set_fireworks(self, heights: Sequence[int]) -> None:
+        """Set the height of the firework of each color."""
+        for color, height in enumerate(heights):
+            old = self._fireworks[color]
+            for value in range(min(old, height), max(old, height)):
+                self._flip(_PLAYED, _PLAYED_VALUE, color * 5 + value)
+            self._fireworks[color] = height
+
+    def set_discards(self, counts: np.ndarray) -> None:
+        """Set the discard pile from the count of each card (rows are colors)."""
+        for card, count in enumerate(counts.ravel().tolist()):
+            old = self._discards[card]
+            for copy in range(min(old, count), max(old, count)):
+                self._flip_discard(card, copy)
+            self._discards[card] = count
+
+    def set_hand(self, seat: int, cards: Sequence[Optional[int]]) -> None:
+        """Set the cards in the hand of `seat` (None if unknown)."""
+        for slot in range(MAX_HAND_SIZE):
+            self._set_card(seat, slot, cards[slot] if slot < len(cards) else None)
+
+    def set_knowledge(self, seat: int, slot: int, can_be: np.ndarray) -> None:
+        """Set what the player of `seat` knows about the card in `slot`."""
+        self._set_mask(seat, slot, int(can_be.ravel() @ _BITS))
+
+    def _remove_card(self, seat: int, slot: int, hand_length: int) -> None:
+        """Shift the hand of `seat` after `slot` is used and an unknown card is drawn."""
+        hand = self._hands[seat]
+        knowledge = self._knowledge[seat]
+        length = sum(1 for mask in knowledge if mask != 0)
+        for i in range(slot, length - 1):
+            self._set_card(seat, i, hand[i + 1])
+            self._set_mask(seat, i, knowledge[i + 1])
+        self._set_card(seat, length - 1, None)
+        self._set_mask(
+            seat, length - 1, _FULL_KNOWLEDGE if hand_length == length else 0
+        )
+
+    def _add_discard(self, card: int) -> None:
+        self._flip_discard(card, self._discards[card])
+        self._discards[card] += 1
+
+    def discard(self, seat: int, slot: int, hand_length: int, card: int) -> None:
+        self._remove_card(seat, slot, hand_length)
+        self._add_discard(card)
+        self.set_tokens(self._notes - 1, self._storms)
+
+    def play(self, seat: int, slot: int, hand_length: int, card: int) -> None:
+        self._remove_card(seat, slot, hand_length)
+        color, value = divmod(card, 5)
+        self.set_fireworks(
+            self._fireworks[:color] + [value + 1] + self._fireworks[color + 1 :]
+        )
+        # A completed firework gives back a note token
+        if value == 4 and self._notes > 0:
+            self.set_tokens(self._notes - 1, self._storms)
+
+    def misplay(self, seat: int, slot: int, hand_length: int, card: int) -> None:
+        self._remove_card(seat, slot, hand_length)
+        self._add_discard(card)
+        self.set_tokens(self._notes, self._storms + 1)
+
+    def hint(self) -> None:
+        """Use a note token: the knowledge is updated with `set_knowledge`."""
+        self.set_tokens(self._notes + 1, self._storms)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+import game_data
+import player
+from game_utils import ObservationEncoder, Seed, game_seed, spawn_seeds
+from game_utils.deck_corpus import DeckCorpus
+from player.bot import Bot
+
+# Requests that only make sense with a server lobby
+LOBBY_REQUESTS = (
+    game_data.ClientPlayerAddData,
+    game_data.ClientPlayerStartRequest,
+    game_data.ClientPlayerReadyData,
+)
+
+
+def make_bot(
+    bot_type: str,
+    player_name: str,
+    games: int,
+    evolve: bool = False,
+    seed: Seed = None,
+) -> Bot:
+    """Create a bot of `bot_type` that is not connected to any server."""
+    if bot_type == "Poirot":
+        return player.Poirot(None, None, player_name, games, evolve, seed)
+    if bot_type == "Canaan":
+        return player.CanaanBot(
+            None, None, player_name, games, "params/canaan2_params.json", evolve, seed
+        )
+    if bot_type == "Nexto":
+        return player.Nexto(
+            None, None, player_name, games, "params/nexto1_params.json", evolve, seed
+        )
+    raise ValueError(f"Unknown bot type {bot_type}")
+
+
+class ObservationLog:
+    """
+    ObservationLog keeps the view of each player at each of its turns, encoded with
+    `ObservationEncoder` in a buffer that grows only when it is full.
+
+    Attributes
+    ----------
+    observations: np.ndarray
+        (turns, layout.size) views in the order they were received.
+    """
+
+    def __init__(self, players: List[str], capacity: int = 4096) -> None:
+        self.encoders = {name: ObservationEncoder(players, name) for name in players}
+        size = self.encoders[players[0]].size
+        self._buffer = np.empty([capacity, size], dtype=np.int8)
+        self._count = 0
+
+    @property
+    def observations(self) -> np.ndarray:
+        return self._buffer[: self._count]
+
+    def add(self, bot: Bot, infos: game_data.ServerGameStateData) -> None:
+        if self._count == len(self._buffer):
+            self._buffer = np.concatenate([self._buffer, np.empty_like(self._buffer)])
+        # Bots without knowledge of the cards leave every card possible
+        knowledge = getattr(bot, "players_knowledge", {})
+        self.encoders[bot.player_name].encode(
+            infos, knowledge, self._buffer[self._count]
+        )
+        self._count += 1
+
+
+def play_games(
+    bots: List[Bot],
+    games: int,
+    seed: Seed = None,
+    decks: Optional[DeckCorpus] = None,
+    log: Optional[ObservationLog] = None,
+) -> np.ndarray:
+    """
+    Play `games` games in a row between `bots`, in the same process and without sockets.
+
+    The bots must not be connected to a server and must expect at least `games` games.
+    Messages are delivered as the server would do: single responses to the sender,
+    the others to every player. Game k is dealt with deck k of `decks` if given,
+    otherwise with the k-th stream spawned from `seed`. If `log` is given, the game
+    state received by each bot is added to it, once the bot has processed it.
+
+    Returns
+    -------
+    scores: np.ndarray
+        The final score of each game.
+    """
+    names = [bot.player_name for bot in bots]
+    by_name = {bot.player_name: bot for bot in bots}
+    requests = deque()  # type: Deque[Tuple[str, game_data.ClientToServerData]]
+    scores = np.zeros(games, dtype=np.uint8)
+
+    def deliver(bot: Bot, data: game_data.ServerToClientData):
+        bot._process_data(data)
+        requests.extend((bot.player_name, request) for request in bot.outbox)
+        bot.outbox.clear()
+
+    game_seeds = spawn_seeds(seed, games)
+    game = game_data.Game()
+    for name in names:
+        game.addPlayer(name)
+
+    def deal(k: int):
+        game.reset(game_seed(game_seeds[k]))
+        game.start(None if decks is None else decks[k])
+
+    deal(0)
+    for bot in bots:
+        deliver(bot, game_data.ServerStartGameData(names))
+
+    played = 0
+    while played < games:
+        if len(requests) == 0:
+            raise RuntimeError(f"Game {played} stalled: no player made a move")
+        sender, request = requests.popleft()
+        if isinstance(request, LOBBY_REQUESTS):
+            continue
+        single, multiple = game.satisfyRequest(request, sender)
+        if single is not None:
+            deliver(by_name[sender], single)
+            if log is not None and type(single) is game_data.ServerGameStateData:
+                log.add(by_name[sender], single)
+        if multiple is not None:
+            if type(multiple) is game_data.ServerGameOver:
+                scores[played] = game.getScore()
+                played += 1
+                # Requests left belong to the ended game
+                requests.clear()
+                if played < games:
+                    deal(played)
+            for bot in bots:
+                deliver(bot, multiple)
+    return scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--bots",
+        help="Type of each bot at the table, in turn order",
+        nargs="+",
+        default=["Nexto", "Nexto"],
+        choices=["Poirot", "Canaan", "Nexto"],
+    )
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--evolve", default=False, action="store_const", const=True)
+    parser.add_argument("--log_level", default="WARNING", type=str)
+    parser.add_argument("--seed", help="Seed of decks and bots", type=int)
+    parser.add_argument("--decks", help="Deck corpus to play", type=str)
+    parser.add_argument(
+        "--observations",
+        help="Save the encoded view of each player at each turn in this .npy file",
+        type=str,
+    )
+    args = parser.parse_args()
+
+    root = np.random.SeedSequence(args.seed)
+    decks_seed, *bots_seeds = root.spawn(len(args.bots) + 1)
+    bots = [
+        make_bot(bot_type, f"Bot{i}", args.games, args.evolve and i == 0, bot_seed)
+        for i, (bot_type, bot_seed) in enumerate(zip(args.bots, bots_seeds))
+    ]
+    for bot in bots:
+        bot.logger.setLevel(args.log_level)
+    decks = None if args.decks is None else DeckCorpus(args.decks)
+    log = None
+    if args.observations is not None:
+        log = ObservationLog([bot.player_name for bot in bots])
+    scores = play_games(bots, args.games, decks_seed, decks, log)
+    if log is not None:
+        np.save(args.observations, log.observations)
+        print(f"Observations: {len(log.observations)}")
+    print(f"Seed: {root.entropy}")
+    print(f"Games: {args.games}")
+    print(f"Average: {np.mean(scores)}")
+    print(f"Min: {np.min(scores)}")
+    print(f"Max: {np.max(scores)}")
+    print(f"std: {np.std(scores)}")
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+import game_data
+from constants import DATASIZE, HOST, PORT
+from game_data import transport
+from game_utils import Seed, spawn_seeds
+
+# Request measured for each answer of the server
+MOVE_ANSWERS = (
+    game_data.ServerActionValid,
+    game_data.ServerPlayerMoveOk,
+    game_data.ServerPlayerThunderStrike,
+    game_data.ServerHintData,
+)
+ANSWERS = MOVE_ANSWERS + (
+    game_data.ServerGameStateData,
+    game_data.ServerGameOver,
+    game_data.ServerActionInvalid,
+)
+REQUEST_KINDS = ["state", "play", "discard", "hint"]
+
+
+class LoadStats:
+    """
+    LoadStats collects what the simulated clients of a process measured.
+
+    Attributes
+    ----------
+    latencies: Dict[str, List[float]]
+        Seconds between each request and its answer, by kind of request.
+    actions: int
+        Plays, discards and hints made.
+    games: int
+        Games played to the end.
+    """
+
+    def __init__(self) -> None:
+        self.latencies = {
+            kind: [] for kind in REQUEST_KINDS
+        }  # type: Dict[str, List[float]]
+        self.actions = 0
+        self.games = 0
+
+    def merge(self, other: "LoadStats") -> None:
+        for kind, values in other.latencies.items():
+            self.latencies[kind].extend(values)
+        self.actions += other.actions
+        self.games += other.games
+
+
+def choose_move(
+    state: game_data.ServerGameStateData,
+    player_name: str,
+    policy: str,
+    rng: np.random.Generator,
+) -> game_data.ClientToServerData:
+    """
+    A legal move for `player_name` given its view `state`.
+
+    Parameters
+    ----------
+    policy: str
+        "random" makes a random play, discard or hint. "scripted" only gives hints and
+        discards the oldest card when no hint is left, so games last until the deck
+        ends.
+    """
+    others = [p for p in state.players if p.name != player_name and len(p.hand) > 0]
+    can_discard = state.usedNoteTokens > 0 and state.handSize > 0
+    can_hint = state.usedNoteTokens < 8 and len(others) > 0
+    if policy == "scripted":
+        if can_hint:
+            # Hint the next player, like a bot helping who moves after it
+            names = [p.name for p in state.players]
+            after = state.players[(names.index(player_name) + 1) % len(names)]
+            target = after if after in others else others[0]
+            return game_data.ClientHintData(
+                player_name, target.name, "value", target.hand[0].value
+            )
+        if can_discard:
+            return game_data.ClientPlayerDiscardCardRequest(player_name, 0)
+        return game_data.ClientPlayerPlayCardRequest(player_name, 0)
+    kinds = ["play"]
+    if can_discard:
+        kinds.append("discard")
+    if can_hint:
+        kinds.append("hint")
+    kind = kinds[rng.integers(len(kinds))]
+    if kind == "play":
+        return game_data.ClientPlayerPlayCardRequest(
+            player_name, int(rng.integers(state.handSize))
+        )
+    if kind == "discard":
+        return game_data.ClientPlayerDiscardCardRequest(
+            player_name, int(rng.integers(state.handSize))
+        )
+    target = others[rng.integers(len(others))]
+    card = target.hand[rng.integers(len(target.hand))]
+    if rng.integers(2) == 0:
+        return game_data.ClientHintData(player_name, target.name, "color", card.color)
+    return game_data.ClientHintData(player_name, target.name, "value", card.value)
+
+
+def request_kind(request: game_data.ClientToServerData) -> str:
+    if type(request) is game_data.ClientPlayerPlayCardRequest:
+        return "play"
+    if type(request) is game_data.ClientPlayerDiscardCardRequest:
+        return "discard"
+    return "hint"
+
+
+async def play_seat(
+    url: str,
+    table: str,
+    player_name: str,
+    games: int,
+    policy: str,
+    seed: Seed,
+    stats: LoadStats,
+    count_games: bool,
+) -> None:
+    """Play `games` games at `table` as a client of the server, timing each request."""
+    rng = np.random.default_rng(seed)
+    reader, writer = await transport.open_connection(url)
+    frames = game_data.FrameReader()
+    inbox = deque()  # type: Deque[game_data.ServerToClientData]
+
+    def send(request: game_data.ClientToServerData):
+        writer.write(request.serialize())
+
+    send(game_data.ClientPlayerAddData(player_name, table))
+    send(game_data.ClientPlayerStartRequest(player_name))
+    players = []  # type: List[str]
+    turn_of = ""
+    played = 0
+    # Kind and send time of the request waiting for an answer
+    pending = None  # type: Optional[tuple]
+    try:
+        while played < games:
+            while len(inbox) == 0:
+                received = await reader.read(DATASIZE)
+                if not received:
+                    raise ConnectionError(f"{player_name}: connection closed")
+                inbox.extend(frames.feed(received))
+            data = inbox.popleft()
+            if pending is not None and type(data) in ANSWERS:
+                kind, sent = pending
+                # The first request of the game also waits for the lobby
+                if kind is not None:
+                    stats.latencies[kind].append(time.perf_counter() - sent)
+                pending = None
+                if type(data) is game_data.ServerGameStateData:
+                    move = choose_move(data, player_name, policy, rng)
+                    send(move)
+                    pending = (request_kind(move), time.perf_counter())
+                    stats.actions += 1
+                    continue
+            if type(data) is game_data.ServerStartGameData:
+                players = data.players
+                turn_of = players[0]
+                send(game_data.ClientPlayerReadyData(player_name))
+                if turn_of == player_name:
+                    send(game_data.ClientGetGameStateRequest(player_name))
+                    pending = (None, time.perf_counter())
+                continue
+            if type(data) in MOVE_ANSWERS:
+                turn_of = data.player
+            elif type(data) is game_data.ServerGameOver:
+                played += 1
+                if count_games:
+                    stats.games += 1
+                turn_of = players[0]
+            elif type(data) is game_data.ServerActionInvalid and not players:
+                raise RuntimeError(f"{player_name}: {data.message}")
+            if turn_of == player_name and pending is None and played < games:
+                send(game_data.ClientGetGameStateRequest(player_name))
+                pending = ("state", time.perf_counter())
+    finally:
+        writer.close()
+
+
+async def play_tables(
+    url: str,
+    tables: List[int],
+    players: int,
+    games: int,
+    policy: str,
+    seed: Seed,
+) -> LoadStats:
+    stats = LoadStats()
+    seeds = spawn_seeds(seed, len(tables) * players)
+    await asyncio.gather(
+        *(
+            play_seat(
+                url,
+                f"load{table}",
+                f"T{table}P{seat}",
+                games,
+                policy,
+                seeds[i * players + seat],
+                stats,
+                seat == 0,
+            )
+            for i, table in enumerate(tables)
+            for seat in range(players)
+        )
+    )
+    return stats
+
+
+def run_tables(
+    url: str, tables: List[int], players: int, games: int, policy: str, seed: Seed
+) -> LoadStats:
+    """Simulate the clients of `tables` in this process."""
+    return asyncio.run(play_tables(url, tables, players, games, policy, seed))
+
+
+def wait_for_server(url: str, timeout: float = 10.0) -> None:
+    start = time.perf_counter()
+    while True:
+        try:
+            transport.connect(url).close()
+            return
+        except OSError:
+            if time.perf_counter() - start > timeout:
+                raise
+            time.sleep(0.1)
+
+
+def report(stats: LoadStats, elapsed: float) -> None:
+    print(f"Elapsed: {elapsed:.2f} s")
+    print(
+        f"Actions: {stats.actions} ({stats.actions / elapsed:.1f}/s), "
+        f"games: {stats.games} ({stats.games / elapsed:.2f}/s)"
+    )
+    columns = ["count", "p50 ms", "p90 ms", "p99 ms", "max ms"]
+    print(f"{'Request':<10}" + "".join(f"{c:>10}" for c in columns))
+    for kind in REQUEST_KINDS:
+        values = np.array(stats.latencies[kind]) * 1000
+        if len(values) == 0:
+            print(f"{kind:<10}{0:>10}")
+            continue
+        percentiles = np.percentile(values, [50, 90, 99]).tolist() + [values.max()]
+        print(
+            f"{kind:<10}{len(values):>10}" + "".join(f"{v:>10.3f}" for v in percentiles)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--url", help="Server url", default=transport.tcp_url(HOST, PORT), type=str
+    )
+    parser.add_argument(
+        "--tables", help="Tables played at the same time", default=50, type=int
+    )
+    parser.add_argument("--players", help="Players of each table", default=2, type=int)
+    parser.add_argument(
+        "--games", help="Games played at each table", default=5, type=int
+    )
+    parser.add_argument(
+        "--policy",
+        help="How the clients choose their moves",
+        choices=["random", "scripted"],
+        default="random",
+    )
+    parser.add_argument(
+        "--processes", help="Processes running the clients", default=1, type=int
+    )
+    parser.add_argument("--seed", help="Seed of the moves", type=int)
+    parser.add_argument(
+        "--spawn",
+        help="Start server.py on the url and stop it at the end",
+        default=False,
+        action="store_const",
+        const=True,
+    )
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                str(args.players),
+                "--url",
+                args.url,
+                "--keep_alive",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        wait_for_server(args.url)
+        processes = max(1, min(args.processes, args.tables))
+        seeds = spawn_seeds(args.seed, processes)
+        jobs = [
+            (
+                args.url,
+                list(range(i, args.tables, processes)),
+                args.players,
+                args.games,
+                args.policy,
+                seeds[i],
+            )
+            for i in range(processes)
+        ]
+        print(
+            f"Tables: {args.tables}, players: {args.players}, games per table: "
+            f"{args.games}, policy: {args.policy}, processes: {processes}"
+        )
+        start = time.perf_counter()
+        if processes == 1:
+            results = [run_tables(*jobs[0])]
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.starmap(run_tables, jobs)
+        elapsed = time.perf_counter() - start
+        stats = LoadStats()
+        for result in results:
+            stats.merge(result)
+        report(stats, elapsed)
+    finally:
+        if server is not None:
+            server.terminate()
@@ -1,22 +1,34 @@
 import json
 import logging
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
 
 import game_data
-from constants import COLORS
-from game_utils import Table, Mutator
+from constants import COLORS, DECK_SIZE
+from game_utils import Mutator, Seed, Table, ZobristHash
 
 from .player import Player
 
 
 class Bot(Player):
+    # Keep `state_hash` up to date, for bots that read it (e.g. to cache searches)
+    track_state_hash = False
+
     def __init__(
-        self, host: str, port: int, player_name: str, games_to_play: int = 1
+        self,
+        host: Optional[str],
+        port: Optional[int],
+        player_name: str,
+        games_to_play: int = 1,
+        seed: Seed = None,
+        table: Optional[str] = None,
+        push_views: bool = False,
+        match_size: int = 0,
+        session: bool = False,
     ) -> None:
-        super().__init__(host, port, player_name)
+        super().__init__(host, port, player_name, table, push_views, match_size)
         self.logger = logging.getLogger(self.player_name)
         self.players = []  # type: List[str]
         self.turn_of = ""
@@ -24,11 +36,27 @@ class Bot(Player):
         self.lives = 3
         self.table = Table()
         self.player_cards = {}  # type: Dict[str, List[game_data.Card]]
+        # Tracked from moves, like the server does to end the game
+        self.cards_in_deck = 0
+        self.last_moves = 0
+        # Key of the current view, updated with each event if `track_state_hash`
+        self.state_hash = (
+            ZobristHash() if self.track_state_hash else None
+        )  # type: Optional[ZobristHash]
         self.need_info = False
+        # Seconds left to make a move when the last state was received, None if unlimited
+        self.turn_time_left = None  # type: Optional[float]
         self.games_to_play = games_to_play
         self.games_played = 0
+        # Every game is played at the same table, so a session can be asked
+        self.session_games = games_to_play if session else 0
+        # In a session the server sends the state of each deal without a request
+        self.session = False
+        self.awaiting_deal = False
+        self.finished = False
         self.parameters = {}  # type: Dict[str, float]
-        self.mutator = Mutator(0.5, 2)
+        self.seed = seed
+        self.mutator = Mutator(0.5, 2, seed)
         self.scores = np.zeros(self.games_to_play)
         # Logger
         formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
@@ -48,6 +76,9 @@ class Bot(Player):
             ndarray[COLORS.index(card.color), card.value - 1] += 1
         return ndarray
 
+    def _card_type(self, card: game_data.Card) -> int:
+        return COLORS.index(card.color) * 5 + card.value - 1
+
     def _count_cards_in_hands(self) -> np.ndarray:
         """Create an array that count the occurences of each card type in player hands."""
         total = np.zeros([5, 5], dtype=np.uint8)
@@ -55,8 +86,23 @@ class Bot(Player):
             total += self._cards_to_ndarray(*hand)
         return total
 
+    def _reset_deck_count(self) -> None:
+        hand_size = 5 if len(self.players) < 4 else 4
+        self.cards_in_deck = DECK_SIZE - hand_size * len(self.players)
+        self.last_moves = len(self.players) + 1
+        if self.state_hash is not None:
+            self.state_hash.reset(len(self.players), hand_size)
+
+    def _count_move(self, draws: bool) -> None:
+        """Update deck and remaining moves after a move (`draws` if play or discard)."""
+        if draws and self.cards_in_deck > 0:
+            self.cards_in_deck -= 1
+        if self.cards_in_deck == 0:
+            self.last_moves -= 1
+
     def _update_infos(self, infos: game_data.ServerGameStateData) -> None:
         self.turn_of = infos.currentPlayer
+        self.state_turn = infos.turn
         self.remaining_hints = 8 - infos.usedNoteTokens
         self.lives = 3 - infos.usedStormTokens
         # Update possible cards
@@ -65,20 +111,65 @@ class Bot(Player):
 
         self.table.set_table(infos.tableCards)
         self.table.set_discard_pile(infos.discardPile)
+        if self.state_hash is not None:
+            self._hash_infos(infos)
         self.need_info = False
+        self.awaiting_deal = False
+        self.turn_time_left = (
+            infos.turnTimeLeft / 1000 if infos.turnTimeLeft > 0 else None
+        )
+
+    def _hash_infos(self, infos: game_data.ServerGameStateData) -> None:
+        """Resync `state_hash` with the view received from the server."""
+        for player in infos.players:
+            self.state_hash.set_hand(
+                self.players.index(player.name),
+                [self._card_type(card) for card in player.hand],
+            )
+        self.state_hash.set_turn(self.players.index(self.turn_of))
+        self.state_hash.set_tokens(infos.usedNoteTokens, infos.usedStormTokens)
+        self.state_hash.set_fireworks(np.sum(self.table.table_array, axis=1).tolist())
+        self.state_hash.set_discards(self.table.discard_array)
 
     def _process_discard(self, action: game_data.ServerActionValid) -> None:
+        self._count_move(True)
+        if self.state_hash is not None:
+            self.state_hash.discard(
+                self.players.index(action.lastPlayer),
+                action.cardHandIndex,
+                action.handLength,
+                self._card_type(action.card),
+            )
+            self.state_hash.set_turn(self.players.index(action.player))
         self.turn_of = action.player
         if self.turn_of == self.player_name:
             self.need_info = True
 
     def _process_played_card(self, action: game_data.ServerPlayerMoveOk) -> None:
+        self._count_move(True)
+        if self.state_hash is not None:
+            self.state_hash.play(
+                self.players.index(action.lastPlayer),
+                action.cardHandIndex,
+                action.handLength,
+                self._card_type(action.card),
+            )
+            self.state_hash.set_turn(self.players.index(action.player))
         self.turn_of = action.player
         if self.turn_of == self.player_name:
             self.need_info = True
 
     def _process_error(self, action: game_data.ServerPlayerThunderStrike) -> None:
         self.logger.warning("Mistake")
+        self._count_move(True)
+        if self.state_hash is not None:
+            self.state_hash.misplay(
+                self.players.index(action.lastPlayer),
+                action.cardHandIndex,
+                action.handLength,
+                self._card_type(action.card),
+            )
+            self.state_hash.set_turn(self.players.index(action.player))
         self.turn_of = action.player
         if self.turn_of == self.player_name:
             self.need_info = True
@@ -87,7 +178,10 @@ class Bot(Player):
         self._player_ready()
         self.status = "Game"
         self.players = action.players
+        self.session = action.sessionGames > 0
+        self.awaiting_deal = self.session
         self.turn_of = self.players[0]
+        self._reset_deck_count()
         if self.turn_of == self.player_name:
             self.need_info = True
 
@@ -117,19 +211,30 @@ class Bot(Player):
         if self.games_played == self.games_to_play:
             if self.mutator.active:
                 self.logger.info(f"Best params: {repr(self.mutator.best_one())}")
+            self.finished = True
             self._disconnect()
-            os._exit(0)
+            return
         self.turn_of = self.players[0]
+        self._reset_deck_count()
         self.remaining_hints = 8
         self.lives = 3
         self.table = Table()
-        for k in self.player_cards:
-            self.player_cards[k].clear()
+        # Hands could be shared with the game when playing in-process
+        self.player_cards = {k: [] for k in self.player_cards}
         self.need_info = True
+        self.awaiting_deal = self.session
 
     def _process_invalid(self, data: game_data.ServerActionInvalid):
         self.logger.error(data.message)
 
+    def _send(self, data: game_data.ClientToServerData):
+        """Send `data` to the server. If the server closed the connection the bot stops."""
+        try:
+            super()._send(data)
+        except (BrokenPipeError, ConnectionError):
+            self.logger.error("Connection closed by the server")
+            self.finished = True
+
     def run(self) -> None:
         super().run()
         self._start_game()
@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import numpy as np
 
-from constants import COLORS
-from game_utils import Mutator, Table
+from constants import COLORS, INITIAL_DECK
+from game_utils import (
+    EndgameMove,
+    EndgameSolver,
+    Mutator,
+    Seed,
+    Table,
+    sample_hands,
+    spawn_seeds,
+)
 
 from .poirot import Hint, Poirot
 
@@ -18,19 +26,97 @@ class CanaanBot(Poirot):
 
     """
 
+    # Search of the last round
+    endgame_time_budget = 0.1
+    endgame_samples = 30
+    # The endgame search is cached by the key of the view
+    track_state_hash = True
+
     def __init__(
         self,
-        host: str,
-        port: int,
+        host: Optional[str],
+        port: Optional[int],
         player_name: str,
         games_to_play: int = 1,
         parameters_file: Optional[str] = None,
         evolve: bool = False,
+        seed: Seed = None,
+        table: Optional[str] = None,
+        push_views: bool = False,
+        match_size: int = 0,
+        session: bool = False,
     ) -> None:
-        super().__init__(host, port, player_name, games_to_play)
+        super().__init__(
+            host,
+            port,
+            player_name,
+            games_to_play,
+            seed=seed,
+            table=table,
+            push_views=push_views,
+            match_size=match_size,
+            session=session,
+        )
+        mutator_seed, endgame_seed = spawn_seeds(seed, 2)
         self.load_parameters(parameters_file)
-        self.mutator = Mutator(0.2, len(self.parameters))
+        self.mutator = Mutator(0.2, len(self.parameters), mutator_seed)
         self.mutator.activate(evolve)
+        self.endgame_rng = np.random.default_rng(endgame_seed)
+        self._endgame_key = None  # type: Optional[Tuple[int, int]]
+        self._endgame_move = None  # type: Optional[EndgameMove]
+
+    def _play_endgame(self) -> bool:
+        """When the deck is empty search the best move. Returns True if a move was made."""
+        if self.cards_in_deck > 0 or self.last_moves <= 0:
+            return False
+        # A view is searched once, even if more rules of the same turn ask for its move
+        key = (self.state_hash.value, self.last_moves)
+        if key != self._endgame_key:
+            self._endgame_key = key
+            self._endgame_move = self._search_endgame()
+        move = self._endgame_move
+        if move is None:
+            return False
+        self.logger.info(f"Endgame move {move}")
+        if move.action == "play":
+            self._play(move.card_index)
+        elif move.action == "discard":
+            self._discard(move.card_index)
+        else:
+            hint = self._select_helpful_hint()
+            if hint is None:
+                hint = self._hint_oldest_to_next_player()
+            self._give_hint(hint.to, hint.type, hint.value)
+        return True
+
+    def _search_endgame(self) -> Optional[EndgameMove]:
+        """Best move of the last round, None if the search did not end in time."""
+        seat = self.players.index(self.player_name)
+        order = self.players[seat:] + self.players[:seat]
+        hands = [None] + [
+            tuple(self._card_type(c) for c in self.player_cards[p]) for p in order[1:]
+        ]
+        unseen = (
+            INITIAL_DECK.astype(np.int64)
+            - self.table.total_table_card()
+            - self._count_cards_in_hands()
+        )
+        own_knowledge = [k.can_be for k in self.players_knowledge[self.player_name]]
+        samples = sample_hands(
+            own_knowledge, np.maximum(unseen, 0), self.endgame_samples, self.endgame_rng
+        )
+        solver = EndgameSolver(
+            np.sum(self.table.table_array, axis=1),
+            hands,
+            8 - self.remaining_hints,
+            3 - self.lives,
+            self.last_moves,
+        )
+        budget = self.endgame_time_budget
+        # Keep time to send the move before the server makes one for us
+        if self.turn_time_left is not None:
+            budget = min(budget, self.turn_time_left / 2)
+        return solver.solve(samples, budget)
 
     def _select_disposable_hint(self, target_player: str) -> Optional[Hint]:
         """Select an hint to advice about useless cards of `target_player`."""
@@ -93,6 +179,8 @@ class CanaanBot(Poirot):
         return None
 
     def _make_action(self) -> None:
+        if self._play_endgame():
+            return
         cards = {
             k: [(c.color, c.value) for c in v] for k, v in self.player_cards.items()
         }
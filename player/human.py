@@ -1,7 +1,6 @@
 import sys
 import threading
 
-import constants
 import game_data
 from .player import Player
 
@@ -11,13 +10,9 @@ class Human(Player):
         while True:
             # Try receiving data otherwise terminate
             try:
-                data = self.socket.recv(constants.DATASIZE)
-            except BrokenPipeError:
+                data = self._receive()
+            except (BrokenPipeError, ConnectionError):
                 return
-            # Process data if it is not empty
-            if not data:
-                continue
-            data = game_data.GameData.deserialize(data)
             if type(data) is game_data.ServerPlayerStartRequestAccepted:
                 dataOk = True
                 print(
@@ -27,14 +22,11 @@ class Human(Player):
                     + str(data.connectedPlayers)
                     + " players"
                 )
-                data = self.socket.recv(constants.DATASIZE)
-                data = game_data.GameData.deserialize(data)
+                data = self._receive()
             if type(data) is game_data.ServerStartGameData:
                 dataOk = True
                 print("Game start!")
-                self.socket.send(
-                    game_data.ClientPlayerReadyData(self.player_name).serialize()
-                )
+                self._send(game_data.ClientPlayerReadyData(self.player_name))
                 self.status = "Game"
             if type(data) is game_data.ServerGameStateData:
                 dataOk = True
@@ -143,6 +143,8 @@ class Nexto(CanaanBot):
         return None
 
     def _make_action(self) -> None:
+        if self._play_endgame():
+            return
         simulation = self._simulate_next_actions()
         # Focusing only on next player
         player = self._next_player(self.player_name)
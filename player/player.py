@@ -1,8 +1,10 @@
 import socket
-from typing import Literal
+from collections import deque
+from typing import Deque, List, Literal, Optional
 
 import constants
 import game_data
+from game_data import transport
 
 
 class Player:
@@ -11,12 +13,22 @@ class Player:
 
     Attributes
     ----------
-    host: str
-        The ip of the server.
-    port: int
+    host: Optional[str]
+        The ip of the server, or its url (see `game_data.transport`). If None the player is not connected and its requests are queued in `outbox`.
+    port: Optional[int]
         The port of the server.
     player_name: str
         The name associated with this player.
+    table: Optional[str]
+        The table to join. If None the server assigns one.
+    push_views: bool
+        Ask the server to send the game state after each move.
+    match_size: int
+        If not 0, wait for a table of this size formed by the server instead of joining `table`.
+    session_games: int
+        Games to play in a row at the table, asked with the start request. 0 for no session.
+    state_turn: int
+        Turn of the last game state received, sent with the moves so that the server refuses them once the turn is over. 0 if not known.
 
     Methods
     -------
@@ -26,57 +38,107 @@ class Player:
         Terminate this entity.
     """
 
-    def __init__(self, host: str, port: int, player_name: str) -> None:
+    def __init__(
+        self,
+        host: Optional[str],
+        port: Optional[int],
+        player_name: str,
+        table: Optional[str] = None,
+        push_views: bool = False,
+        match_size: int = 0,
+    ) -> None:
         self.status = "Lobby"
         self.player_name = player_name
+        self.table = table
+        self.push_views = push_views
+        self.match_size = match_size
+        self.session_games = 0
+        self.state_turn = 0
+        self.socket = None  # type: Optional[socket.socket]
+        self.outbox = []  # type: List[game_data.ClientToServerData]
+        # Messages received but not processed yet
+        self.frames = game_data.FrameReader()
+        self.inbox = deque()  # type: Deque[game_data.ServerToClientData]
+        if host is not None:
+            self._connect(host, port)
+
+    def _connect(self, host: str, port: int):
         # Init socket
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((host, port))
+        url = host if "://" in host else transport.tcp_url(host, port)
+        self.socket = transport.connect(url)
         # Start connection
-        self.socket.send(game_data.ClientPlayerAddData(player_name).serialize())
-        data = self.socket.recv(constants.DATASIZE)
-        data = game_data.GameData.deserialize(data)
+        if self.match_size:
+            # The server seats the players of the same type together, if asked to
+            request = game_data.ClientMatchRequest(
+                self.player_name, type(self).__name__, self.match_size, self.push_views
+            )
+        else:
+            request = game_data.ClientPlayerAddData(
+                self.player_name, self.table, self.push_views
+            )
+        self.socket.sendall(request.serialize())
+        data = self._receive()
         if type(data) is game_data.ServerPlayerConnectionOk:
-            print("Connection accepted by the server. Welcome " + player_name)
-        print(f"[{player_name}-{self.status}]: ", end="")
+            print("Connection accepted by the server. Welcome " + self.player_name)
+        print(f"[{self.player_name}-{self.status}]: ", end="")
+
+    def _send(self, data: game_data.ClientToServerData):
+        """Send `data` to the server or queue it in `outbox` if not connected."""
+        if self.socket is None:
+            self.outbox.append(data)
+        else:
+            self.socket.sendall(data.serialize())
+
+    def _receive(self) -> game_data.ServerToClientData:
+        """Wait for the next message from the server."""
+        while len(self.inbox) == 0:
+            data = self.socket.recv(constants.DATASIZE)
+            if not data:
+                raise ConnectionError("Connection closed by the server")
+            self.inbox.extend(self.frames.feed(data))
+        return self.inbox.popleft()
 
     def _start_game(self):
-        self.socket.send(
-            game_data.ClientPlayerStartRequest(self.player_name).serialize()
+        self._send(
+            game_data.ClientPlayerStartRequest(self.player_name, self.session_games)
         )
 
     def _player_ready(self):
-        self.socket.send(game_data.ClientPlayerReadyData(self.player_name).serialize())
+        self._send(game_data.ClientPlayerReadyData(self.player_name))
         self.status = "Game"
 
     def _get_infos(self):
-        self.socket.send(
-            game_data.ClientGetGameStateRequest(self.player_name).serialize()
-        )
+        self._send(game_data.ClientGetGameStateRequest(self.player_name))
 
     def _discard(self, card: int):
-        self.socket.send(
-            game_data.ClientPlayerDiscardCardRequest(self.player_name, card).serialize()
+        self._send(
+            game_data.ClientPlayerDiscardCardRequest(
+                self.player_name, card, self.state_turn
+            )
         )
 
     def _play(self, card: int):
-        self.socket.send(
-            game_data.ClientPlayerPlayCardRequest(self.player_name, card).serialize()
+        self._send(
+            game_data.ClientPlayerPlayCardRequest(
+                self.player_name, card, self.state_turn
+            )
         )
 
     def _give_hint(self, player: str, hint_type: Literal["color", "value"], hint):
-        self.socket.send(
+        self._send(
             game_data.ClientHintData(
-                self.player_name, player, hint_type, hint
-            ).serialize()
+                self.player_name, player, hint_type, hint, self.state_turn
+            )
         )
 
     def _disconnect(self):
-        self.socket.shutdown(2)
+        if self.socket is not None:
+            self.socket.shutdown(2)
 
     def run(self) -> None:
         """Start the threads to manage the game"""
 
     def end(self) -> None:
         """Terminate all threads and close socket to finish the game"""
-        self.socket.close()
+        if self.socket is not None:
+            self.socket.close()
@@ -4,8 +4,8 @@ from typing import Dict, List, Optional
 import numpy as np
 
 import game_data
-from constants import COLORS, DATASIZE, INITIAL_DECK
-from game_utils import CardKnowledge
+from constants import COLORS, INITIAL_DECK
+from game_utils import CardKnowledge, Seed
 
 from .bot import Bot
 
@@ -23,13 +23,28 @@ class Poirot(Bot):
 
     def __init__(
         self,
-        host: str,
-        port: int,
+        host: Optional[str],
+        port: Optional[int],
         player_name: str,
         games_to_play: int = 1,
         evolve: bool = False,
+        seed: Seed = None,
+        table: Optional[str] = None,
+        push_views: bool = False,
+        match_size: int = 0,
+        session: bool = False,
     ) -> None:
-        super().__init__(host, port, player_name, games_to_play)
+        super().__init__(
+            host,
+            port,
+            player_name,
+            games_to_play,
+            seed,
+            table,
+            push_views,
+            match_size,
+            session,
+        )
         self.players_knowledge = {
             self.player_name: []
         }  # type: Dict[str, List[CardKnowledge]]
@@ -52,9 +67,11 @@ class Poirot(Bot):
             ]
 
     def _elaborate_hint(self, hint: game_data.ServerHintData) -> None:
+        self._count_move(False)
         self.turn_of = hint.player
         if self.turn_of == self.player_name:
             self.need_info = True
+        seat = self.players.index(hint.destination)
         for i in hint.positions:
             if hint.type == "value":
                 self.players_knowledge[hint.destination][i].set_suggested_value(
@@ -64,6 +81,13 @@ class Poirot(Bot):
                 self.players_knowledge[hint.destination][i].set_suggested_color(
                     hint.value
                 )
+            if self.state_hash is not None:
+                self.state_hash.set_knowledge(
+                    seat, i, self.players_knowledge[hint.destination][i].can_be
+                )
+        if self.state_hash is not None:
+            self.state_hash.hint()
+            self.state_hash.set_turn(self.players.index(self.turn_of))
 
     def _process_discard(self, action: game_data.ServerActionValid) -> None:
         super()._process_discard(action)
@@ -85,10 +109,13 @@ class Poirot(Bot):
 
     def _update_infos(self, infos: game_data.ServerGameStateData) -> None:
         super()._update_infos(infos)
-        for possibility in self.players_knowledge[self.player_name]:
+        seat = self.players.index(self.player_name)
+        for i, possibility in enumerate(self.players_knowledge[self.player_name]):
             possibility.remove_cards(
                 self._count_cards_in_hands() + self.table.total_table_card()
             )
+            if self.state_hash is not None:
+                self.state_hash.set_knowledge(seat, i, possibility.can_be)
         self.need_info = False
 
     def _delete_knowledge(self, player_name: str, index: int, new_hand_lenght: int):
@@ -344,42 +371,49 @@ class Poirot(Bot):
                 self._discard(card_index)
                 return
 
+    def _process_data(self, data: game_data.ServerToClientData) -> None:
+        """Update the state with `data` and, if it is our turn, answer the server."""
+        # Process infos
+        if type(data) is game_data.ServerActionInvalid:
+            self._process_invalid(data)
+            self.turn_of = ""
+            return
+        if type(data) is game_data.ServerPlayerThunderStrike:
+            self._process_error(data)
+        if type(data) is game_data.ServerStartGameData:
+            self._process_game_start(data)
+        if type(data) is game_data.ServerActionValid:
+            self._process_discard(data)
+        if type(data) is game_data.ServerHintData:
+            self._elaborate_hint(data)
+        if type(data) is game_data.ServerGameStateData:
+            self._update_infos(data)
+        if type(data) is game_data.ServerPlayerMoveOk:
+            self._process_played_card(data)
+        if type(data) is game_data.ServerGameOver:
+            self._process_game_over(data)
+        if self.finished:
+            return
+
+        # Exec bot turn
+        if self.turn_of == self.player_name:
+            if self.need_info:
+                # Pushed game state is on its way
+                if not self.push_views and not self.awaiting_deal:
+                    self.logger.debug("Requesting infos...")
+                    self._get_infos()
+            else:
+                self.logger.info(f"Making turn of {self.turn_of}")
+                self._make_action()
+
     def run(self) -> None:
         super().run()
-        while True:
+        while not self.finished:
             try:
-                data = self.socket.recv(DATASIZE)
-                data = game_data.GameData.deserialize(data)
+                data = self._receive()
             except:
                 self.logger.error("Socket Error")
+                self.finished = True
                 self._disconnect()
                 break
-            # Process infos
-            if type(data) is game_data.ServerActionInvalid:
-                self._process_invalid(data)
-                self.turn_of = ""
-                continue
-            if type(data) is game_data.ServerPlayerThunderStrike:
-                self._process_error(data)
-            if type(data) is game_data.ServerStartGameData:
-                self._process_game_start(data)
-            if type(data) is game_data.ServerActionValid:
-                self._process_discard(data)
-            if type(data) is game_data.ServerHintData:
-                self._elaborate_hint(data)
-            if type(data) is game_data.ServerGameStateData:
-                self._update_infos(data)
-            if type(data) is game_data.ServerPlayerMoveOk:
-                self._process_played_card(data)
-            if type(data) is game_data.ServerGameOver:
-                self._process_game_over(data)
-
-            # break
-            # Exec bot turn
-            if self.turn_of == self.player_name:
-                if self.need_info:
-                    self.logger.debug("Requesting infos...")
-                    self._get_infos()
-                else:
-                    self.logger.info(f"Making turn of {self.turn_of}")
-                    self._make_action()
+            self._process_data(data)
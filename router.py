@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from constants import *
+import game_data
+from game_data import transport
+from game_utils import game_seed, spawn_seeds
+
+# ROUTER
+# Clients connect to the router, that assigns each table to a server.py worker and
+# forwards the bytes of its players: tables are independent, so more workers play
+# more games at the same time on a machine with many cores
+
+serverScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+
+numPlayers = 2
+routerUrl = transport.tcp_url(HOST, PORT)
+# "least" gives a new table to the worker with less tables, "hash" to the one chosen by
+# the hash of its name
+routingPolicy = "least"
+# Seconds between two health checks of each worker
+healthInterval = 2.0
+# Seconds each player has to make a move, passed to the workers
+turnTime = 0.0
+
+workers = []  # type: List[Worker]
+# Worker of each table, and connections of the table that are still open
+tableWorkers = {}  # type: Dict[str, Worker]
+tableConnections = {}  # type: Dict[str, int]
+# Table filled with the players that did not ask for one
+openTable = None  # type: Optional[str]
+tableCounter = 0
+routerClosed = None  # type: Optional[asyncio.Event]
+routerLoop = None  # type: Optional[asyncio.AbstractEventLoop]
+
+
+class Worker:
+    """
+    Worker is a server.py process listening on a Unix domain socket, that hosts the
+    tables given to it by the router.
+
+    Attributes
+    ----------
+    tables: Set[str]
+        Tables assigned to this worker that still have players.
+    healthy: bool
+        True if the last health check reached the worker, only healthy workers get
+        new tables.
+    """
+
+    def __init__(self, index: int, seed: Optional[int]):
+        self.index = index
+        self.seed = seed
+        self.path = os.path.join(
+            tempfile.gettempdir(), f"hanabi-{os.getpid()}-{index}.sock"
+        )
+        self.url = "unix://" + self.path
+        self.tables = set()  # type: Set[str]
+        self.healthy = False
+        self.process = None  # type: Optional[subprocess.Popen]
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        args = [sys.executable, serverScript, str(numPlayers)]
+        if self.seed is not None:
+            args.append(str(self.seed))
+        args += ["--url", self.url, "--keep_alive", "--turn_time", str(turnTime)]
+        # Workers log in game.log, their console is not needed
+        self.process = subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+        )
+        logging.info("Worker %d started with pid %d", self.index, self.process.pid)
+
+    async def check(self):
+        """Restart the worker if it exited and check that it accepts connections."""
+        if self.process.poll() is not None:
+            logging.warning(
+                "Worker %d exited with code %d", self.index, self.process.returncode
+            )
+            self.healthy = False
+            self.start()
+            return
+        try:
+            _, writer = await asyncio.wait_for(
+                transport.open_connection(self.url), healthInterval
+            )
+            writer.close()
+            healthy = True
+        except (OSError, asyncio.TimeoutError):
+            healthy = False
+        if healthy != self.healthy:
+            logging.info(
+                "Worker %d %s", self.index, "healthy" if healthy else "unhealthy"
+            )
+        self.healthy = healthy
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def chooseWorker(tableName: str) -> Optional[Worker]:
+    """The healthy worker that will host `tableName`, following `routingPolicy`."""
+    healthy = [worker for worker in workers if worker.healthy]
+    if not healthy:
+        return None
+    if routingPolicy == "hash":
+        return healthy[zlib.crc32(tableName.encode()) % len(healthy)]
+    return min(healthy, key=lambda worker: len(worker.tables))
+
+
+def routeTable(tableName: Optional[str]) -> Tuple[str, Optional[Worker]]:
+    """
+    Name the table of a new connection, `tableName` or the open one if None, and return
+    the worker that hosts it, None if no worker can take it.
+    """
+    global openTable
+    global tableCounter
+    if tableName is None:
+        if openTable is None:
+            while str(tableCounter) in tableWorkers:
+                tableCounter += 1
+            openTable = str(tableCounter)
+        tableName = openTable
+    if tableName not in tableWorkers:
+        worker = chooseWorker(tableName)
+        if worker is None:
+            return tableName, None
+        tableWorkers[tableName] = worker
+        tableConnections[tableName] = 0
+        worker.tables.add(tableName)
+        logging.info("Table %s assigned to worker %d", tableName, worker.index)
+    tableConnections[tableName] += 1
+    # The next players without a table start a new one
+    if tableName == openTable and tableConnections[tableName] >= numPlayers:
+        openTable = None
+    return tableName, tableWorkers[tableName]
+
+
+def releaseTable(tableName: str):
+    global openTable
+    tableConnections[tableName] -= 1
+    if tableConnections[tableName] == 0:
+        del tableConnections[tableName]
+        tableWorkers.pop(tableName).tables.discard(tableName)
+        if tableName == openTable:
+            openTable = None
+
+
+async def forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Copy bytes from `reader` to `writer` until one of them is closed."""
+    try:
+        while True:
+            data = await reader.read(DATASIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def manageConnection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+):
+    # The first frame is the connection request, that tells the table
+    buffer = bytearray()
+    size = 0
+    while len(buffer) < 2 or len(buffer) < size:
+        try:
+            received = await reader.read(DATASIZE)
+        except ConnectionError:
+            received = b""
+        if not received:
+            writer.close()
+            return
+        buffer += received
+        if len(buffer) >= 2:
+            size = 2 + int.from_bytes(buffer[:2], "little")
+    data = game_data.GameData.deserialize(buffer[:size])
+    if type(data) is not game_data.ClientPlayerAddData:
+        writer.close()
+        return
+    tableName, worker = routeTable(data.table)
+    workerWriter = None
+    if worker is not None:
+        try:
+            workerReader, workerWriter = await transport.open_connection(worker.url)
+        except OSError:
+            logging.warning("Worker %d refused %s", worker.index, data.sender)
+    if workerWriter is None:
+        if worker is not None:
+            releaseTable(tableName)
+        writer.write(
+            game_data.ServerActionInvalid("No server available for the table.").serialize()
+        )
+        writer.close()
+        return
+    # Players that did not ask for a table join the one named by the router
+    data.table = tableName
+    workerWriter.write(data.serialize())
+    workerWriter.write(bytes(buffer[size:]))
+    try:
+        await asyncio.gather(
+            forward(reader, workerWriter), forward(workerReader, writer)
+        )
+    finally:
+        releaseTable(tableName)
+
+
+def logWorkers():
+    for worker in workers:
+        logging.info(
+            "Worker %d %s, tables: %d",
+            worker.index,
+            "healthy" if worker.healthy else "unhealthy",
+            len(worker.tables),
+        )
+
+
+def manageInput():
+    while True:
+        try:
+            data = input()
+        except EOFError:
+            return
+        if data == "exit" and routerLoop is not None:
+            logging.info("Closing the router...")
+            routerLoop.call_soon_threadsafe(routerClosed.set)
+            return
+        elif data == "stats" and routerLoop is not None:
+            routerLoop.call_soon_threadsafe(logWorkers)
+
+
+async def checkWorkers():
+    while True:
+        await asyncio.gather(*(worker.check() for worker in workers))
+        await asyncio.sleep(healthInterval)
+
+
+async def manageNetwork():
+    global routerClosed
+    global routerLoop
+    routerClosed = asyncio.Event()
+    routerLoop = asyncio.get_running_loop()
+    # Stop the workers also when the router is terminated
+    routerLoop.add_signal_handler(signal.SIGTERM, routerClosed.set)
+    # Wait for the workers to listen before accepting players
+    for _ in range(100):
+        await asyncio.gather(*(worker.check() for worker in workers))
+        if all(worker.healthy for worker in workers):
+            break
+        await asyncio.sleep(0.1)
+    checker = asyncio.create_task(checkWorkers())
+    server = await transport.serve(routerUrl, manageConnection)
+    logging.info(
+        "Hanabi router started on %s with %d workers", routerUrl, len(workers)
+    )
+    try:
+        await routerClosed.wait()
+    finally:
+        checker.cancel()
+        server.close()
+        await server.wait_closed()
+
+
+def start_router(
+    nplayers, nworkers, seed=None, url=None, policy="least", turn=0.0
+):
+    global numPlayers
+    global routerUrl
+    global routingPolicy
+    global turnTime
+    numPlayers = nplayers
+    turnTime = turn
+    if url is not None:
+        routerUrl = url
+    routingPolicy = policy
+    logging.basicConfig(
+        filename="game.log",
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S %p",
+    )
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    # Each worker deals its games from its own stream
+    seeds = [None] * nworkers
+    if seed is not None:
+        seeds = [game_seed(s) for s in spawn_seeds(np.random.SeedSequence(seed), nworkers)]
+    for i in range(nworkers):
+        workers.append(Worker(i, seeds[i]))
+        workers[i].start()
+    threading.Thread(target=manageInput, daemon=True).start()
+    try:
+        asyncio.run(manageNetwork())
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "players", help="Players of each table", type=int, nargs="?", default=numPlayers
+    )
+    parser.add_argument("seed", help="Seed of the decks", type=int, nargs="?")
+    parser.add_argument(
+        "--workers",
+        help="Server processes hosting the tables",
+        type=int,
+        default=os.cpu_count(),
+    )
+    parser.add_argument(
+        "--url",
+        help="Where to listen: tcp://host:port or unix:///path",
+        default=routerUrl,
+    )
+    parser.add_argument(
+        "--policy",
+        help="Give a new table to the least loaded worker or choose it by the table name",
+        choices=["least", "hash"],
+        default=routingPolicy,
+    )
+    parser.add_argument(
+        "--turn_time",
+        help="Seconds each player has to make a move, 0 for no limit",
+        type=float,
+        default=turnTime,
+    )
+    args = parser.parse_args()
+    print("Type 'exit' to end the program, 'stats' to log the tables of each worker")
+    start_router(
+        max(args.players, 2),
+        max(args.workers, 1),
+        args.seed,
+        args.url,
+        args.policy,
+        args.turn_time,
+    )
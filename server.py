@@ -1,184 +1,878 @@
+import argparse
+import asyncio
 import logging
 import os
-import socket
 import sys
 import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
 
 from constants import *
 import game_data
+from game_data import transport
+from game_utils import game_seed, spawn_seeds
 
-mutex = threading.Lock()
 # SERVER
-playerConnections = {}
-game = game_data.Game()
-
-playersOk = []
-
 statuses = ["Lobby", "Game"]
-status = statuses[0]
 
-commandQueue = {}
 numPlayers = 2
+# Each table is given a stream spawned from this one
+serverSeeds = np.random.SeedSequence()
 
+# Where clients connect, see game_data.transport
+serverUrl = transport.tcp_url(HOST, PORT)
 
-def manageConnection(conn: socket, addr):
-    global status
-    global game
-    with conn:
-        logging.info("Connected by: " + str(addr))
-        keepActive = True
-        playerName = ""
-        while keepActive:
-            print("SERVER WAITING")
-            data = conn.recv(DATASIZE)
-
-            mutex.acquire(True)
-
-            if not data:
-                del playerConnections[playerName]
-                logging.warning("Player disconnected: " + playerName)
-                game.removePlayer(playerName)
-                if len(playerConnections) == 0:
-                    logging.info("Shutting down server")
-                    os._exit(0)
-                keepActive = False
-            else:
-                print(f"SERVER PROCESSING {game_data.GameData.deserialize(data)}")
-                data = game_data.GameData.deserialize(data)
-                print(f"SERVER RECEIVED {type(data)} from {data.sender}")
-                if status == "Lobby":
-                    if type(data) is game_data.ClientPlayerAddData:
-                        playerName = data.sender
-                        commandQueue[playerName] = []
-                        if (
-                            playerName in playerConnections.keys()
-                            or playerName == ""
-                            and playerName is None
-                        ):
-                            logging.warning("Duplicate player: " + playerName)
-                            conn.send(
-                                game_data.ServerActionInvalid(
-                                    "Player with that name already registered."
-                                ).serialize()
-                            )
-                            mutex.release()
-                            return
-                        playerConnections[playerName] = (conn, addr)
-                        logging.info("Player connected: " + playerName)
-                        game.addPlayer(playerName)
-                        conn.send(
-                            game_data.ServerPlayerConnectionOk(playerName).serialize()
-                        )
-                    elif type(data) is game_data.ClientPlayerStartRequest:
-                        game.setPlayerReady(playerName)
-                        logging.info("Player ready: " + playerName)
-                        conn.send(
-                            game_data.ServerPlayerStartRequestAccepted(
-                                len(game.getPlayers()), game.getNumReadyPlayers()
-                            ).serialize()
+# Tables by name. Everything runs in the event loop thread, so no lock is needed
+tables = {}  # type: Dict[str, Table]
+tableCounter = 0
+# Set when the last table is closed
+serverClosed = None  # type: Optional[asyncio.Event]
+serverLoop = None  # type: Optional[asyncio.AbstractEventLoop]
+
+# Frames that can wait to be sent to a client
+maxQueueDepth = 1024
+# When a client does not read fast enough "drop" discards the frames that do not fit in
+# its queue, "fail" closes its connection and ends the game of its table
+overflowPolicy = "fail"
+# Seconds each player has to make a move, 0 for no limit
+turnTime = 0.0
+# Keep running when the last table is closed, as a worker of router.py
+keepAlive = False
+
+# How tables are formed from the players waiting for a match: "mirror" seats players of
+# the same bot type together, "mixed" in order of arrival, "round-robin" takes one
+# player of each bot type in turn
+matchPolicy = "mixed"
+# Players waiting for a match: for each table size, the queue of each bot type with
+# (order of arrival, player name, request, connection)
+matchPool = {}  # type: Dict[int, Dict[str, Deque[tuple]]]
+# Table size and bot type of each waiting player
+matchWaiting = {}  # type: Dict[str, Tuple[int, str]]
+# Order of arrival of the match requests
+matchCounter = 0
+
+
+class StageTimers:
+    """
+    StageTimers measures the time spent by the server in each stage of the requests:
+    decoding them, playing them on the game, encoding the answers and writing them to
+    the sockets. It is enabled with --timers and shown by 'stats'.
+    """
+
+    stages = ["decode", "game", "encode", "send"]
+
+    def __init__(self):
+        self.totals = dict.fromkeys(self.stages, 0.0)
+        self.counts = dict.fromkeys(self.stages, 0)
+
+    def add(self, stage: str, start: float, count: int = 1):
+        """Add the time from `start` to now, spent for `count` messages."""
+        self.totals[stage] += time.perf_counter() - start
+        self.counts[stage] += count
+
+    def log(self):
+        for stage in self.stages:
+            if self.counts[stage]:
+                logging.info(
+                    "Stage %s: %d messages, %.1f us each",
+                    stage,
+                    self.counts[stage],
+                    self.totals[stage] / self.counts[stage] * 1e6,
+                )
+
+
+# None unless the stages are timed
+stageTimers = None  # type: Optional[StageTimers]
+
+
+class Connection:
+    """
+    Connection sends the frames queued for a client with its own task, so a client that
+    does not read cannot stall its table. The queue is bounded: when it is full the
+    frames that do not fit are dropped and, with the "fail" `overflowPolicy`, the
+    connection is closed.
+
+    Attributes
+    ----------
+    maxDepth: int
+        Frames that can wait in the queue.
+    overflowed: bool
+        True if the connection was closed because the queue was full, nothing is sent
+        anymore.
+    dropped: int
+        Frames that did not fit in the queue.
+    playerName: str
+        The name of the player, set when it joins a table or the match pool.
+    table: Optional[Table]
+        The table of the player, set when it joins one.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, maxDepth: int):
+        self.writer = writer
+        self.maxDepth = maxDepth
+        self.overflowed = False
+        self.dropped = 0
+        self.closed = False
+        self.playerName = ""
+        self.table = None  # type: Optional[Table]
+        self.queue = []  # type: List[bytes]
+        self.ready = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    @property
+    def depth(self) -> int:
+        """Frames waiting to be sent."""
+        return len(self.queue)
+
+    def sendFrames(self, frames: List[bytes]) -> bool:
+        """Queue `frames`. Returns False only when they overflow the queue."""
+        # Nothing is sent anymore
+        if self.overflowed or self.closed:
+            return True
+        if len(self.queue) + len(frames) > self.maxDepth:
+            self.dropped += len(frames)
+            if overflowPolicy == "fail":
+                self.overflowed = True
+                self.queue.clear()
+                self.writer.transport.abort()
+            return False
+        self.queue.extend(frames)
+        self.ready.set()
+        return True
+
+    async def run(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                frames, self.queue = self.queue, []
+                start = time.perf_counter() if stageTimers else 0.0
+                self.writer.writelines(frames)
+                if stageTimers:
+                    stageTimers.add("send", start, len(frames))
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    def close(self):
+        """Close the connection after writing the frames still in the queue."""
+        if self.closed:
+            return
+        self.closed = True
+        self.task.cancel()
+        if not self.overflowed and self.queue:
+            self.writer.writelines(self.queue)
+        self.queue = []
+        self.writer.close()
+
+
+class TurnTimeout:
+    """Put in the inbox of a table when the time of its `turn`-th turn is over."""
+
+    def __init__(self, turn: int):
+        self.turn = turn
+
+
+class Table:
+    """
+    Table is a game with its own lobby and players. The state of the table is changed
+    only by its task, that processes the requests of its players one at a time: tables
+    are independent, so many games can be played at the same time by the same server.
+
+    Attributes
+    ----------
+    name: str
+        The name used by clients to join this table.
+    numPlayers: int
+        Players needed to start the game.
+    members: Set[str]
+        Players that joined this table, their requests could be still in the inbox.
+    inbox: asyncio.Queue
+        Requests of the players as (player name, request, connection).
+    sessionGames: int
+        Games to play in a row if the players agreed on a session, else 0.
+    timeouts: Dict[str, int]
+        Turns of each player that ended because its time was over.
+    """
+
+    def __init__(self, name: str, numPlayers: int, seed: np.random.SeedSequence):
+        self.name = name
+        self.numPlayers = numPlayers
+        self.members = set()  # type: Set[str]
+        self.inbox = asyncio.Queue()
+        self.game = game_data.Game()
+        self.playerConnections = {}  # type: Dict[str, Connection]
+        # Frames to send to each player when the current request is processed
+        self.outgoing = {}  # type: Dict[str, List[bytes]]
+        # Players that receive their game state after each move
+        self.viewers = set()  # type: Set[str]
+        self.playersOk = []
+        # Games asked by each player with its start request
+        self.sessionRequests = {}  # type: Dict[str, int]
+        self.sessionGames = 0
+        self.gamesPlayed = 0
+        # Moves made, to tell if a timeout belongs to the current turn
+        self.turns = 0
+        self.turnDeadline = 0.0
+        self.turnTimer = None  # type: Optional[asyncio.TimerHandle]
+        self.timeouts = {}  # type: Dict[str, int]
+        self.status = statuses[0]
+        # Moves of the current deal
+        self.moves = 0
+        # Set when a player leaves during the game, that cannot go on
+        self.abandoned = False
+        self.commandQueue = {}
+        # Set when the last player leaves, the table cannot be joined anymore
+        self.closed = False
+        # Each game is dealt with a stream spawned from this one
+        self.gameSeeds = seed
+        # Requests handled by the table itself, the others are played on the game
+        self.handlers = {
+            game_data.ClientPlayerAddData: self.addPlayer,
+            game_data.ClientMatchRequest: self.addPlayer,
+            TurnTimeout: self.turnTimeout,
+        }  # type: Dict[type, Callable]
+        # Requests answered in the lobby, the others wait for the game to start
+        self.lobbyHandlers = {
+            game_data.ClientPlayerStartRequest: self.startRequest,
+            game_data.ClientPlayerReadyData: self.readyRequest,
+        }  # type: Dict[type, Callable]
+        self.task = asyncio.create_task(self.run())
+
+    def isOpen(self) -> bool:
+        """True if a player can still join this table."""
+        return (
+            not self.closed
+            and self.status == "Lobby"
+            and len(self.members) < self.numPlayers
+        )
+
+    def startGame(self):
+        seed = game_seed(spawn_seeds(self.gameSeeds, 1)[0])
+        logging.info("Table %s game seed: %d", self.name, seed)
+        self.game.reset(seed)
+        self.game.start()
+        self.moves = 0
+
+    def encode(self, data: game_data.ServerToClientData) -> bytes:
+        start = time.perf_counter() if stageTimers else 0.0
+        frame = data.serialize()
+        if stageTimers:
+            stageTimers.add("encode", start)
+        return frame
+
+    def send(self, playerName: str, data: game_data.ServerToClientData):
+        if type(data) is game_data.ServerGameStateData:
+            data.turnTimeLeft = self.turnTimeLeft()
+            data.turn = self.turns
+        self.outgoing[playerName].append(self.encode(data))
+
+    def broadcast(self, data: game_data.ServerToClientData):
+        # Encoded once, the same bytes are sent to everyone
+        frame = self.encode(data)
+        for id in self.playerConnections:
+            self.outgoing[id].append(frame)
+
+    def flush(self):
+        """Queue the frames of the last request, to be sent with a single write for each player."""
+        slow = []
+        for id, frames in self.outgoing.items():
+            if frames:
+                if not self.playerConnections[id].sendFrames(frames):
+                    slow.append(id)
+                frames.clear()
+        for id in slow:
+            self.overflow(id)
+
+    def overflow(self, playerName: str):
+        """Apply `overflowPolicy` to the player whose queue is full."""
+        if overflowPolicy == "drop":
+            logging.warning(
+                "Outbound queue of %s is full, %d frames dropped",
+                playerName,
+                self.playerConnections[playerName].dropped,
+            )
+            return
+        logging.warning("Outbound queue of %s is full, dropping it", playerName)
+        if self.status != "Game":
+            return
+        self.failGame(playerName, "Game failed: " + playerName + " is too slow")
+
+    def failGame(self, playerName: str, message: str):
+        """End the game because of `playerName` and close the other connections."""
+        logging.warning("Game failed at table %s", self.name)
+        frame = game_data.ServerGameOver(0, message).serialize()
+        for id, conn in self.playerConnections.items():
+            if id != playerName:
+                conn.sendFrames([frame])
+                conn.close()
+
+    def newTurn(self):
+        """A move was made: start the clock of the next player, if the game goes on."""
+        self.turns += 1
+        if self.turnTimer is not None:
+            self.turnTimer.cancel()
+            self.turnTimer = None
+        if turnTime > 0 and not self.game.isGameOver():
+            loop = asyncio.get_running_loop()
+            self.turnDeadline = loop.time() + turnTime
+            self.turnTimer = loop.call_later(
+                turnTime,
+                self.inbox.put_nowait,
+                (None, TurnTimeout(self.turns), None),
+            )
+
+    def turnTimeLeft(self) -> int:
+        """Milliseconds left to the current player, 0 if there is no limit."""
+        if self.turnTimer is None:
+            return 0
+        left = self.turnDeadline - asyncio.get_running_loop().time()
+        return max(1, int(left * 1000))
+
+    def turnTimeout(
+        self,
+        playerName: Optional[str],
+        timeout: TurnTimeout,
+        conn: Optional[Connection],
+    ):
+        """Make a move for the current player, whose time is over."""
+        if timeout.turn != self.turns or self.status != "Game":
+            return
+        moves = self.game.getLegalMoves()
+        if not moves:
+            return
+        # Discard the oldest card or, when discarding is not allowed, give a hint
+        move = next(
+            (m for m in moves if type(m) is game_data.ClientPlayerDiscardCardRequest),
+            None,
+        )
+        if move is None:
+            move = next(
+                (m for m in moves if type(m) is game_data.ClientHintData), moves[0]
+            )
+        playerName = move.sender
+        self.timeouts[playerName] = self.timeouts.get(playerName, 0) + 1
+        logging.warning(
+            "Time over for %s at table %s, timeouts: %d",
+            playerName,
+            self.name,
+            self.timeouts[playerName],
+        )
+        self.playMove(playerName, move)
+
+    def queueDepths(self) -> Dict[str, int]:
+        """Frames waiting to be sent to each player."""
+        return {id: conn.depth for id, conn in self.playerConnections.items()}
+
+    def pushViews(self, dealt: bool = False):
+        """
+        Send to each player that asked for it the game state it would request. In a
+        session every player receives the state of a new deal.
+        """
+        ids = self.playerConnections if dealt and self.sessionGames else self.viewers
+        for id in ids:
+            self.send(id, self.game.getGameState(id))
+
+    def addPlayer(
+        self,
+        playerName: str,
+        data: game_data.ClientToServerData,
+        conn: Connection,
+    ):
+        self.commandQueue[playerName] = []
+        self.playerConnections[playerName] = conn
+        self.outgoing[playerName] = []
+        if data.pushViews:
+            self.viewers.add(playerName)
+        logging.info("Player connected: %s at table %s", playerName, self.name)
+        self.game.addPlayer(playerName)
+        self.send(playerName, game_data.ServerPlayerConnectionOk(playerName))
+
+    def removePlayer(self, playerName: str):
+        del self.playerConnections[playerName]
+        del self.outgoing[playerName]
+        self.viewers.discard(playerName)
+        self.sessionRequests.pop(playerName, None)
+        self.commandQueue.pop(playerName, None)
+        logging.warning("Player disconnected: %s", playerName)
+        self.game.removePlayer(playerName)
+        if self.status == "Game" and not self.abandoned:
+            self.abandon(playerName)
+
+    def abandon(self, playerName: str):
+        """
+        `playerName` left during the game: requests still in the inbox are dropped and,
+        if the deal was being played, the other players are told that the game failed.
+        """
+        self.abandoned = True
+        # Nobody moves anymore
+        if self.turnTimer is not None:
+            self.turnTimer.cancel()
+            self.turnTimer = None
+        if self.moves > 0 and not self.game.isGameOver():
+            self.failGame(playerName, "Game failed: " + playerName + " left")
+        else:
+            for conn in self.playerConnections.values():
+                conn.close()
+
+    def startRequest(self, playerName: str, data: game_data.ClientPlayerStartRequest):
+        self.sessionRequests[playerName] = data.sessionGames
+        self.game.setPlayerReady(playerName)
+        logging.info("Player ready: %s", playerName)
+        self.send(
+            playerName,
+            game_data.ServerPlayerStartRequestAccepted(
+                len(self.game.getPlayers()), self.game.getNumReadyPlayers()
+            ),
+        )
+        if (
+            len(self.game.getPlayers()) == self.game.getNumReadyPlayers()
+            and len(self.game.getPlayers()) >= self.numPlayers
+        ):
+            listNames = [player.name for player in self.game.getPlayers()]
+            logging.info("Game start at table %s! Between: %s", self.name, listNames)
+            # A session needs every player to ask for the same games
+            requested = set(self.sessionRequests.values())
+            if len(requested) == 1:
+                self.sessionGames = requested.pop()
+            self.broadcast(game_data.ServerStartGameData(listNames, self.sessionGames))
+            self.startGame()
+
+    def readyRequest(self, playerName: str, data: game_data.ClientPlayerReadyData):
+        # This ensures every player is ready to send requests
+        self.playersOk.append(1)
+
+    def beginGame(self):
+        """Every player is ready: answer the requests sent during the lobby."""
+        self.status = "Game"
+        # The clock of the first player starts now
+        self.newTurn()
+        for player, commands in self.commandQueue.items():
+            for cmd in commands:
+                if self.satisfy(player, cmd):
+                    self.newTurn()
+            commands.clear()
+        self.pushViews(True)
+
+    def satisfy(self, playerName: str, data: game_data.ClientToServerData) -> bool:
+        """Apply `data` to the game and queue the answers. Returns True for a move."""
+        start = time.perf_counter() if stageTimers else 0.0
+        singleData, multipleData = self.game.satisfyRequest(data, playerName)
+        if stageTimers:
+            stageTimers.add("game", start)
+        if singleData is not None:
+            self.send(playerName, singleData)
+        if multipleData is None:
+            return False
+        self.broadcast(multipleData)
+        return True
+
+    def playMove(self, playerName: str, data: game_data.ClientToServerData):
+        if not self.satisfy(playerName, data):
+            return
+        self.moves += 1
+        dealt = False
+        if self.game.isGameOver():
+            logging.info("Game score at table %s: %d", self.name, self.game.getScore())
+            self.gamesPlayed += 1
+            if self.sessionGames and self.gamesPlayed >= self.sessionGames:
+                logging.info("Session over at table %s", self.name)
+                self.newTurn()
+                return
+            self.startGame()
+            dealt = True
+        self.newTurn()
+        # The first turn of a new deal goes out with the game over
+        self.pushViews(dealt)
+
+    def processRequest(
+        self,
+        playerName: str,
+        data: game_data.ClientToServerData,
+        conn: Optional[Connection] = None,
+    ):
+        if self.status == "Game":
+            # A move chosen on the state of a turn that is over, e.g. made by the
+            # server because its time was over, must not be played in a later turn
+            if getattr(data, "turn", 0) not in (0, self.turns):
+                logging.warning("Late move of %s at table %s", playerName, self.name)
+                self.send(
+                    playerName,
+                    game_data.ServerActionInvalid("The turn of this move is over"),
+                )
+                return
+            self.playMove(playerName, data)
+            return
+        handler = self.lobbyHandlers.get(type(data))
+        if handler is not None:
+            handler(playerName, data)
+        else:
+            # Answered when the game starts
+            self.commandQueue[playerName].append(data)
+        # If every player is ready to send requests, then the game can start
+        if len(self.playersOk) == len(self.game.getPlayers()):
+            self.beginGame()
+
+    async def run(self):
+        """Process the requests in the inbox until the last player leaves."""
+        while True:
+            playerName, data, conn = await self.inbox.get()
+            try:
+                if data is None:
+                    self.removePlayer(playerName)
+                    if self.closed and len(self.playerConnections) == 0:
+                        if self.turnTimer is not None:
+                            self.turnTimer.cancel()
+                        return
+                elif not self.abandoned:
+                    self.handlers.get(type(data), self.processRequest)(
+                        playerName, data, conn
+                    )
+                self.flush()
+            except Exception:
+                logging.exception("Error at table %s", self.name)
+
+
+def newTable(tableName: Optional[str] = None, size: int = 0) -> Table:
+    """Create the table `tableName`, or one named by the server if None."""
+    global tableCounter
+    if tableName is None:
+        while str(tableCounter) in tables:
+            tableCounter += 1
+        tableName = str(tableCounter)
+    tables[tableName] = Table(
+        tableName, size or numPlayers, spawn_seeds(serverSeeds, 1)[0]
+    )
+    logging.info("New table: %s", tableName)
+    return tables[tableName]
+
+
+def joinTable(playerName: str, tableName: Optional[str]) -> Optional[Table]:
+    """
+    Seat `playerName` at the table called `tableName`, or at the first open one if None.
+    Tables are created when needed. Returns None if the table cannot be joined.
+    """
+    if not playerName:
+        return None
+    table = None  # type: Optional[Table]
+    if tableName is None:
+        table = next((t for t in tables.values() if t.isOpen()), None)
+    if table is None:
+        table = tables[tableName] if tableName in tables else newTable(tableName)
+    if playerName in table.members or not table.isOpen():
+        return None
+    table.members.add(playerName)
+    return table
+
+
+def pickPlayers(queues: Dict[str, Deque], size: int) -> Optional[List]:
+    """Take from `queues` the players of a table of `size`, following `matchPolicy`."""
+    if matchPolicy == "mirror":
+        queue = next((q for q in queues.values() if len(q) >= size), None)
+        if queue is None:
+            return None
+        return [queue.popleft() for _ in range(size)]
+    if sum(len(q) for q in queues.values()) < size:
+        return None
+    picked = []
+    if matchPolicy == "mixed":
+        # Heads of the queues are the oldest requests of each type
+        for _ in range(size):
+            queue = min((q for q in queues.values() if q), key=lambda q: q[0][0])
+            picked.append(queue.popleft())
+        return picked
+    while len(picked) < size:
+        for queue in queues.values():
+            if queue and len(picked) < size:
+                picked.append(queue.popleft())
+    # The next table starts from the following bot type
+    first = next(iter(queues))
+    queues[first] = queues.pop(first)
+    return picked
+
+
+def matchPlayer(data: game_data.ClientMatchRequest, conn: Connection) -> bool:
+    """
+    Put the player in the pool and seat it as soon as a table can be formed.
+    Returns False if the request is not valid.
+    """
+    global matchCounter
+    if (
+        not data.sender
+        or data.sender in matchWaiting
+        or not 2 <= data.tableSize <= 5
+    ):
+        return False
+    queues = matchPool.setdefault(data.tableSize, {})
+    queue = queues.setdefault(data.botType, deque())
+    queue.append((matchCounter, data.sender, data, conn))
+    matchCounter += 1
+    matchWaiting[data.sender] = (data.tableSize, data.botType)
+    picked = pickPlayers(queues, data.tableSize)
+    if picked is None:
+        return True
+    table = newTable(size=data.tableSize)
+    for _, playerName, request, playerConn in picked:
+        del matchWaiting[playerName]
+        table.members.add(playerName)
+        playerConn.table = table
+        table.inbox.put_nowait((playerName, request, playerConn))
+    logging.info("Match formed at table %s", table.name)
+    return True
+
+
+def leavePool(playerName: str):
+    size, botType = matchWaiting.pop(playerName)
+    queue = matchPool[size][botType]
+    for entry in queue:
+        if entry[1] == playerName:
+            queue.remove(entry)
+            break
+
+
+def leaveTable(table: Table, playerName: str):
+    table.members.discard(playerName)
+    table.inbox.put_nowait((playerName, None, None))
+    if len(table.members) == 0:
+        table.closed = True
+        del tables[table.name]
+        logging.info("Closed table: %s", table.name)
+        if len(tables) == 0 and len(matchWaiting) == 0 and not keepAlive:
+            logging.info("Shutting down server")
+            serverClosed.set()
+
+
+def joinRequest(data: game_data.ClientPlayerAddData, conn: Connection) -> bool:
+    """Seat the player at the table it asked for. Returns False if it cannot join."""
+    conn.table = joinTable(data.sender, data.table)
+    if conn.table is None:
+        logging.warning("Cannot join: %s", data.sender)
+        conn.sendFrames(
+            [
+                game_data.ServerActionInvalid(
+                    "Player with that name already registered or table is full."
+                ).serialize()
+            ]
+        )
+        return False
+    conn.playerName = data.sender
+    conn.table.inbox.put_nowait((conn.playerName, data, conn))
+    return True
+
+
+def matchRequest(data: game_data.ClientMatchRequest, conn: Connection) -> bool:
+    """Put the player in the match pool. Returns False if the request is not valid."""
+    if not matchPlayer(data, conn):
+        logging.warning("Cannot match: %s", data.sender)
+        conn.sendFrames(
+            [
+                game_data.ServerActionInvalid(
+                    "Player with that name already waiting or table size not valid."
+                ).serialize()
+            ]
+        )
+        return False
+    conn.playerName = data.sender
+    return True
+
+
+# First requests of a connection, the next ones go to the inbox of its table
+connectionHandlers = {
+    game_data.ClientPlayerAddData: joinRequest,
+    game_data.ClientMatchRequest: matchRequest,
+}  # type: Dict[type, Callable[..., bool]]
+
+
+async def manageConnection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+):
+    logging.info("Connected by: %s", writer.get_extra_info("peername"))
+    frames = game_data.FrameReader()
+    connection = Connection(writer, maxQueueDepth)
+    try:
+        while True:
+            try:
+                received = await reader.read(DATASIZE)
+            except ConnectionError:
+                break
+            if not received:
+                break
+            start = time.perf_counter() if stageTimers else 0.0
+            messages = frames.feed(received)
+            if stageTimers:
+                stageTimers.add("decode", start, len(messages))
+            for data in messages:
+                logging.debug("Received %s from %s", type(data).__name__, data.sender)
+                if connection.playerName:
+                    if connection.table is not None and type(data) not in connectionHandlers:
+                        connection.table.inbox.put_nowait(
+                            (connection.playerName, data, connection)
                         )
+                    continue
+                handler = connectionHandlers.get(type(data))
+                if handler is not None and not handler(data, connection):
+                    return
+    finally:
+        if connection.table is not None:
+            leaveTable(connection.table, connection.playerName)
+        elif connection.playerName in matchWaiting:
+            leavePool(connection.playerName)
+        connection.close()
+
 
-                        if (
-                            len(game.getPlayers()) == game.getNumReadyPlayers()
-                            and len(game.getPlayers()) >= numPlayers
-                        ):
-                            listNames = []
-                            for player in game.getPlayers():
-                                listNames.append(player.name)
-                            logging.info("Game start! Between: " + str(listNames))
-                            for player in playerConnections:
-                                playerConnections[player][0].send(
-                                    game_data.ServerStartGameData(listNames).serialize()
-                                )
-                            game.start()
-
-                    # This ensures every player is ready to send requests
-                    elif type(data) is game_data.ClientPlayerReadyData:
-                        playersOk.append(1)
-                    # If every player is ready to send requests, then the game can start
-                    if len(playersOk) == len(game.getPlayers()):
-                        status = "Game"
-                        for player in commandQueue:
-                            for cmd in commandQueue[player]:
-                                singleData, multipleData = game.satisfyRequest(
-                                    cmd, player
-                                )
-                                if singleData is not None:
-                                    playerConnections[player][0].send(
-                                        singleData.serialize()
-                                    )
-                                if multipleData is not None:
-                                    for id in playerConnections:
-                                        playerConnections[id][0].send(
-                                            multipleData.serialize()
-                                        )
-                                        if game.isGameOver():
-                                            os._exit(0)
-                        commandQueue.clear()
-                    elif (
-                            type(data) is not game_data.ClientPlayerAddData
-                            and type(data) is not game_data.ClientPlayerStartRequest
-                            and type(data) is not game_data.ClientPlayerReadyData
-                    ):
-                        commandQueue[playerName].append(data)
-                # In game
-                elif status == "Game":
-                    singleData, multipleData = game.satisfyRequest(data, playerName)
-                    if singleData is not None:
-                        conn.send(singleData.serialize())
-                    if multipleData is not None:
-                        for id in playerConnections:
-                            playerConnections[id][0].send(multipleData.serialize())
-                            if game.isGameOver():
-                                logging.info("Game over")
-                                logging.info("Game score: " + str(game.getScore()))
-                                # os._exit(0)
-                                players = game.getPlayers()
-                                game = game_data.Game()
-                                for player in players:
-                                    logging.info("Starting new game")
-                                    game.addPlayer(player.name)
-                                game.start()
-            mutex.release()
+def logQueueDepths():
+    for table in tables.values():
+        logging.info("Table %s queues: %s", table.name, table.queueDepths())
+        if table.timeouts:
+            logging.info("Table %s timeouts: %s", table.name, table.timeouts)
+    if stageTimers is not None:
+        stageTimers.log()
 
 
 def manageInput():
     while True:
-        data = input()
+        try:
+            data = input()
+        except EOFError:
+            return
         if data == "exit":
             logging.info("Closing the server...")
             os._exit(0)
+        elif data == "stats" and serverLoop is not None:
+            serverLoop.call_soon_threadsafe(logQueueDepths)
 
 
-def manageNetwork():
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, PORT))
-        logging.info("Hanabi server started on " + HOST + ":" + str(PORT))
-        while True:
-            s.listen()
-            conn, addr = s.accept()
-            threading.Thread(target=manageConnection, args=(conn, addr)).start()
+async def manageNetwork():
+    global serverClosed
+    global serverLoop
+    serverClosed = asyncio.Event()
+    serverLoop = asyncio.get_running_loop()
+    server = await transport.serve(serverUrl, manageConnection)
+    logging.info("Hanabi server started on %s", serverUrl)
+    try:
+        await serverClosed.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        if stageTimers is not None:
+            stageTimers.log()
 
 
-def start_server(nplayers):
+def start_server(
+    nplayers,
+    seed=None,
+    maxQueue=1024,
+    overflow="fail",
+    url=None,
+    keep=False,
+    match="mixed",
+    turn=0.0,
+    timers=False,
+    logLevel="INFO",
+):
     global numPlayers
+    global serverSeeds
+    global maxQueueDepth
+    global overflowPolicy
+    global serverUrl
+    global keepAlive
+    global matchPolicy
+    global turnTime
+    global stageTimers
     numPlayers = nplayers
+    turnTime = turn
+    keepAlive = keep
+    matchPolicy = match
+    if timers:
+        stageTimers = StageTimers()
+    if url is not None:
+        serverUrl = url
+    maxQueueDepth = maxQueue
+    overflowPolicy = overflow
+    serverSeeds = np.random.SeedSequence(seed)
     logging.basicConfig(
         filename="game.log",
-        level=logging.INFO,
+        level=getattr(logging, logLevel),
         format="%(asctime)s %(levelname)s: %(message)s",
         datefmt="%m/%d/%Y %I:%M:%S %p",
     )
     logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
-    threading.Thread(target=manageNetwork).start()
-    manageInput()
+    logging.info("Server seed: %s", serverSeeds.entropy)
+    threading.Thread(target=manageInput, daemon=True).start()
+    asyncio.run(manageNetwork())
 
 
 if __name__ == "__main__":
-    print("Type 'exit' to end the program")
-    if len(sys.argv) > 1:
-        if int(sys.argv[1]) > 1:
-            numPlayers = int(sys.argv[1])
-
-    start_server(numPlayers)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "players", help="Players of each table", type=int, nargs="?", default=numPlayers
+    )
+    parser.add_argument("seed", help="Seed of the decks", type=int, nargs="?")
+    parser.add_argument(
+        "--max_queue",
+        help="Frames that can wait to be sent to a client",
+        type=int,
+        default=maxQueueDepth,
+    )
+    parser.add_argument(
+        "--overflow",
+        help="When a client queue is full drop the frames that do not fit or fail its game",
+        choices=["drop", "fail"],
+        default=overflowPolicy,
+    )
+    parser.add_argument(
+        "--url",
+        help="Where to listen: tcp://host:port or unix:///path",
+        default=serverUrl,
+    )
+    parser.add_argument(
+        "--keep_alive",
+        help="Keep running when the last table is closed",
+        default=False,
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "--match",
+        help="How tables are formed from the players waiting for a match",
+        choices=["mirror", "mixed", "round-robin"],
+        default=matchPolicy,
+    )
+    parser.add_argument(
+        "--turn_time",
+        help="Seconds each player has to make a move, 0 for no limit",
+        type=float,
+        default=turnTime,
+    )
+    parser.add_argument(
+        "--timers",
+        help="Time the decoding, game, encoding and sending of the requests",
+        default=False,
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "--log_level",
+        help="DEBUG also logs each request and move",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+    )
+    args = parser.parse_args()
+    print(
+        "Type 'exit' to end the program, 'stats' to log queues, timeouts and timers"
+    )
+    start_server(
+        max(args.players, 2),
+        args.seed,
+        args.max_queue,
+        args.overflow,
+        args.url,
+        args.keep_alive,
+        args.match,
+        args.turn_time,
+        args.timers,
+        args.log_level,
+    )
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from constants import COLORS, DECK_SIZE
+from game_data import BatchGame, Game
+from game_data.GameData import (
+    ClientHintData,
+    ClientPlayerDiscardCardRequest,
+    ClientPlayerPlayCardRequest,
+    ServerGameOver,
+)
+
+
+def to_request(batch: BatchGame, action: int):
+    """The request of the current player of game 0 for `action`."""
+    H = batch.hand_size
+    current = int(batch.current[0])
+    name = f"P{current}"
+    if action < H:
+        return ClientPlayerPlayCardRequest(name, action)
+    if action < 2 * H:
+        return ClientPlayerDiscardCardRequest(name, action - H)
+    k = action - 2 * H
+    destination = f"P{(current + k // 10 + 1) % batch.num_players}"
+    if k % 10 < 5:
+        return ClientHintData(name, destination, "color", COLORS[k % 10])
+    return ClientHintData(name, destination, "value", k % 10 - 4)
+
+
+def request_key(request):
+    if type(request) is ClientHintData:
+        return request.sender, request.destination, request.type, request.value
+    return type(request).__name__, request.sender, request.handCardOrdered
+
+
+def assert_same_state(batch: BatchGame, game: Game):
+    view = game.getGameState("P0")
+    assert [p.name for p in game.getPlayers()].index(view.currentPlayer) == batch.current[0]
+    for seat, player in enumerate(game.getPlayers()):
+        hand = [card.id for card in player.hand]
+        hand += [-1] * (batch.hand_size - len(hand))
+        assert hand == batch.hands[0, seat].tolist()
+    assert [len(view.tableCards[c]) for c in COLORS] == batch.fireworks[0].tolist()
+    discards = np.zeros([5, 5], dtype=np.uint8)
+    for card in view.discardPile:
+        discards[COLORS.index(card.color), card.value - 1] += 1
+    assert (discards == batch.discards[0]).all()
+    assert view.usedNoteTokens == batch.note_tokens[0]
+    assert view.usedStormTokens == batch.storm_tokens[0]
+
+
+@pytest.mark.parametrize("players", [2, 3, 4, 5])
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_game_follows_game(players, seed):
+    rng = np.random.default_rng(seed)
+    deck = rng.permutation(DECK_SIZE).astype(np.uint8)
+    game = Game()
+    for i in range(players):
+        game.addPlayer(f"P{i}")
+    game.start(deck)
+    batch = BatchGame(1, players)
+    batch.reset(decks=deck[None])
+    assert_same_state(batch, game)
+    while not batch.done[0]:
+        legal = batch.legal_actions()[0]
+        assert {request_key(to_request(batch, a)) for a in np.flatnonzero(legal)} == {
+            request_key(move) for move in game.getLegalMoves()
+        }
+        # Few plays, so that games often reach the end of the deck
+        weights = np.where(np.arange(batch.num_actions) < batch.hand_size, 0.1, 1.0)
+        weights = weights * legal
+        action = int(rng.choice(batch.num_actions, p=weights / weights.sum()))
+        request = to_request(batch, action)
+        single, multiple = game.satisfyRequest(request, request.sender)
+        assert single is None and multiple is not None
+        batch.step(np.array([action]))
+        if batch.done[0]:
+            assert type(multiple) is ServerGameOver
+            assert multiple.score == batch.score[0]
+        else:
+            assert not game.isGameOver()
+            assert_same_state(batch, game)
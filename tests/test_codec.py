@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from game_data import FrameReader, codec
+from game_data.codec_benchmark import sample_messages
+from game_data.GameData import *
+from game_data.game import Card, Player
+
+
+def plain(value):
+    """`value` as builtins, to compare messages by content."""
+    if isinstance(value, Card):
+        return value.id
+    if isinstance(value, Player):
+        return value.name, [card.id for card in value.hand]
+    if isinstance(value, GameData):
+        return type(value), {k: plain(v) for k, v in vars(value).items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    return value
+
+
+def test_samples_cover_every_schema():
+    covered = {type(message) for message in sample_messages()}
+    assert covered == {schema[0] for schema in codec.SCHEMAS}
+
+
+@pytest.mark.parametrize(
+    "message", sample_messages(), ids=lambda message: type(message).__name__
+)
+def test_round_trip(message):
+    assert plain(codec.decode(codec.encode(message))) == plain(message)
+
+
+def test_frames_split_anywhere():
+    messages = sample_messages()
+    stream = b"".join(message.serialize() for message in messages)
+    for chunk in (1, 3, 64, len(stream)):
+        frames = FrameReader()
+        received = []
+        for i in range(0, len(stream), chunk):
+            received.extend(frames.feed(stream[i : i + chunk]))
+        assert [plain(m) for m in received] == [plain(m) for m in messages]
+
+
+def test_other_versions_are_refused():
+    data = bytearray(codec.encode(ClientPlayerReadyData("Bot0")))
+    data[0] = codec.VERSION - 1
+    with pytest.raises(ValueError):
+        codec.decode(bytes(data))
+
+
+@pytest.mark.parametrize(
+    "request_type", [ClientPlayerPlayCardRequest, ClientPlayerDiscardCardRequest]
+)
+def test_negative_positions_reach_the_server(request_type):
+    # The game answers that the card does not exist, so the codec must not refuse it
+    message = request_type("Bot0", -1)
+    assert codec.decode(codec.encode(message)).handCardOrdered == -1
+
+
+def test_numpy_positions():
+    message = ClientPlayerPlayCardRequest("Bot0", np.int64(2))
+    assert codec.decode(codec.encode(message)).handCardOrdered == 2
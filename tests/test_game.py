@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from game_data import Game, checkMakeUnmake
+
+
+def new_game(players: int, seed: int) -> Game:
+    game = Game()
+    for i in range(players):
+        game.addPlayer(f"P{i}")
+    game.reset(seed)
+    game.start()
+    return game
+
+
+@pytest.mark.parametrize("players", [2, 3, 4, 5])
+@pytest.mark.parametrize("seed", range(5))
+def test_make_unmake_restores_state(players, seed):
+    # Long sequences reach the end of the deck and the end of the game
+    checkMakeUnmake(new_game(players, seed), sequences=20, length=80, seed=seed)
+
+
+def test_start_accepts_any_deck_sequence():
+    deck = list(range(50))
+    hands = []
+    for cards in (deck, tuple(deck), np.array(deck, dtype=np.uint8)):
+        game = Game()
+        game.addPlayer("P0")
+        game.addPlayer("P1")
+        game.start(cards)
+        hands.append([card.id for card in game.getPlayers()[0].hand])
+    assert hands[0] == hands[1] == hands[2] == [0, 1, 2, 3, 4]
+
+
+def test_reset_clears_ready_players():
+    game = new_game(3, 0)
+    for player in game.getPlayers():
+        game.setPlayerReady(player.name)
+    assert game.getNumReadyPlayers() == 3
+    game.reset(1)
+    assert game.getNumReadyPlayers() == 0
@@ -0,0 +1,27 @@
+import socket
+
+import player
+
+
+def closed_bot():
+    """A bot whose server already closed the connection."""
+    bot = player.Poirot(None, None, "Bot0", 1)
+    bot.socket, server = socket.socketpair()
+    server.close()
+    return bot
+
+
+def test_send_to_closed_server_stops_the_bot():
+    bot = closed_bot()
+    # The first write can succeed, the next ones find the connection closed
+    for _ in range(3):
+        bot._play(0)
+    assert bot.finished
+    bot.end()
+
+
+def test_run_ends_when_the_server_closes():
+    bot = closed_bot()
+    bot.run()
+    assert bot.finished
+    bot.end()
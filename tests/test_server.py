@@ -0,0 +1,135 @@
+import asyncio
+
+import numpy as np
+
+import game_data
+import server
+
+
+MOVES = (
+    game_data.ServerHintData,
+    game_data.ServerActionValid,
+    game_data.ServerPlayerMoveOk,
+    game_data.ServerPlayerThunderStrike,
+)
+
+
+class StubWriter:
+    """A stream writer that records the frames, and never drains if `stalled`."""
+
+    def __init__(self, stalled: bool = False) -> None:
+        self.frames = []
+        self.aborted = False
+        self.closed = False
+        self.stalled = stalled
+        self.transport = self
+
+    def writelines(self, frames):
+        self.frames.extend(frames)
+
+    async def drain(self):
+        if self.stalled:
+            await asyncio.Event().wait()
+
+    def abort(self):
+        self.aborted = True
+
+    def close(self):
+        self.closed = True
+
+    def messages(self):
+        return game_data.FrameReader().feed(b"".join(self.frames))
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+async def seated_table(writers):
+    """A table with a player for each of `writers`, whose game has begun."""
+    table = server.Table("test", len(writers), np.random.SeedSequence(0))
+    conns = {name: server.Connection(writer, 4) for name, writer in writers.items()}
+    for request in (
+        game_data.ClientPlayerAddData,
+        game_data.ClientPlayerStartRequest,
+        game_data.ClientPlayerReadyData,
+    ):
+        for name, conn in conns.items():
+            table.inbox.put_nowait((name, request(name), conn))
+    await settle()
+    assert table.status == "Game"
+    return table, conns
+
+
+def close(table, conns):
+    table.task.cancel()
+    for conn in conns.values():
+        conn.task.cancel()
+
+
+def safe_move(table):
+    """A hint or a discard of the current player, so the game does not end."""
+    return next(
+        m
+        for m in table.game.getLegalMoves()
+        if type(m) is not game_data.ClientPlayerPlayCardRequest
+    )
+
+
+async def play_with_slow_reader(moves: int):
+    """Play `moves` moves at a table where P1 never reads. Returns the writers."""
+    writers = {"P0": StubWriter(), "P1": StubWriter(stalled=True)}
+    table, conns = await seated_table(writers)
+    for _ in range(moves):
+        move = safe_move(table)
+        table.inbox.put_nowait((move.sender, move, conns[move.sender]))
+        await settle()
+    close(table, conns)
+    return writers
+
+
+def test_drop_keeps_the_game(monkeypatch):
+    monkeypatch.setattr(server, "overflowPolicy", "drop")
+    writers = asyncio.run(play_with_slow_reader(10))
+    assert not writers["P1"].aborted
+    assert not writers["P0"].closed
+    # The other player receives every move
+    moves = [m for m in writers["P0"].messages() if type(m) in MOVES]
+    assert len(moves) == 10
+
+
+def test_fail_ends_the_game(monkeypatch):
+    monkeypatch.setattr(server, "overflowPolicy", "fail")
+    writers = asyncio.run(play_with_slow_reader(10))
+    assert writers["P1"].aborted
+    assert writers["P0"].closed
+    over = writers["P0"].messages()[-1]
+    assert type(over) is game_data.ServerGameOver and over.score == 0
+
+
+async def move_after_timeout():
+    """P0 moves after the server moved for it. Returns the moves played."""
+    writers = {"P0": StubWriter(), "P1": StubWriter()}
+    table, conns = await seated_table(writers)
+    late = safe_move(table)
+    late.turn = table.turns
+    table.inbox.put_nowait((None, server.TurnTimeout(table.turns), None))
+    await settle()
+    # P1 moves in time, then the move of P0 arrives in its next turn
+    move = safe_move(table)
+    move.turn = table.turns
+    table.inbox.put_nowait(("P1", move, conns["P1"]))
+    table.inbox.put_nowait(("P0", late, conns["P0"]))
+    await settle()
+    close(table, conns)
+    return [m for m in writers["P0"].messages() if type(m) in MOVES], writers
+
+
+def test_late_moves_are_refused():
+    moves, writers = asyncio.run(move_after_timeout())
+    # The move made by the server and the move of P1
+    assert len(moves) == 2
+    assert moves[-1].player == "P0"
+    refused = writers["P0"].messages()[-1]
+    assert type(refused) is game_data.ServerActionInvalid
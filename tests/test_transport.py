@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+import game_data
+from game_data import transport
+from game_data.codec_benchmark import sample_messages
+
+from .test_codec import plain
+
+
+async def echo(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Decode the frames of the client and send them back encoded again."""
+    frames = game_data.FrameReader()
+    while True:
+        received = await reader.read(4096)
+        if not received:
+            break
+        writer.writelines([data.serialize() for data in frames.feed(received)])
+        await writer.drain()
+    writer.close()
+
+
+def test_memory_round_trip():
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    stop = asyncio.Event()
+
+    async def serve():
+        server = await transport.serve("memory://echo", echo)
+        started.set()
+        await stop.wait()
+        server.close()
+        await server.wait_closed()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),))
+    thread.start()
+    started.wait()
+    sent = sample_messages()
+    sock = transport.connect("memory://echo")
+    try:
+        sock.sendall(b"".join(data.serialize() for data in sent))
+        frames = game_data.FrameReader()
+        received = []
+        while len(received) < len(sent):
+            chunk = sock.recv(4096)
+            assert chunk, "connection closed by the server"
+            received.extend(frames.feed(chunk))
+    finally:
+        sock.close()
+        loop.call_soon_threadsafe(stop.set)
+        thread.join()
+        loop.close()
+    assert plain(received) == plain(sent)
+
+
+def test_memory_without_server():
+    with pytest.raises(ConnectionRefusedError):
+        transport.connect("memory://nobody")
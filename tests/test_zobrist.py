@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from constants import CARD_COLORS, CARD_VALUES
+from game_data import BatchGame
+from game_utils import ZobristHash
+
+# Card ids of `Game` to the card types hashed by `ZobristHash`
+TYPES = (CARD_COLORS.astype(np.int64) * 5 + CARD_VALUES - 1).tolist()
+
+
+def hand_types(hand: np.ndarray):
+    return [TYPES[card] if card >= 0 else None for card in hand.tolist()]
+
+
+def rebuild(batch: BatchGame, observer: int = 0) -> ZobristHash:
+    """Hash of the view of `observer` of game 0, built from scratch."""
+    zobrist = ZobristHash()
+    zobrist.reset(batch.num_players, batch.hand_size)
+    for seat in range(batch.num_players):
+        hand = batch.hands[0, seat]
+        if seat != observer:
+            zobrist.set_hand(seat, hand_types(hand))
+        for slot in range(batch.hand_size):
+            can_be = batch.knowledge[0, seat, slot]
+            if hand[slot] < 0:
+                # Nothing can be in an empty slot
+                can_be = np.zeros_like(can_be)
+            zobrist.set_knowledge(seat, slot, can_be)
+    zobrist.set_fireworks(batch.fireworks[0].tolist())
+    zobrist.set_discards(batch.discards[0])
+    zobrist.set_tokens(int(batch.note_tokens[0]), int(batch.storm_tokens[0]))
+    zobrist.set_turn(int(batch.current[0]))
+    return zobrist
+
+
+def permute_colors(batch: BatchGame, permutation: np.ndarray) -> BatchGame:
+    """Copy of game 0 of `batch` with color c renamed to `permutation[c]`."""
+    ids = np.zeros([5, 5], dtype=np.int64)
+    ids[CARD_COLORS, CARD_VALUES - 1] = np.arange(len(CARD_COLORS))
+    renamed = ids[permutation[CARD_COLORS], CARD_VALUES - 1]
+    other = BatchGame(1, batch.num_players)
+    other.hands[0] = np.where(batch.hands[0] >= 0, renamed[batch.hands[0]], -1)
+    other.fireworks[0, permutation] = batch.fireworks[0]
+    other.discards[0, permutation] = batch.discards[0]
+    other.knowledge[0][..., permutation, :] = batch.knowledge[0]
+    other.note_tokens[0] = batch.note_tokens[0]
+    other.storm_tokens[0] = batch.storm_tokens[0]
+    other.current[0] = batch.current[0]
+    return other
+
+
+def random_step(batch: BatchGame, rng: np.random.Generator) -> int:
+    legal = batch.legal_actions()[0]
+    # Few plays, so that games often reach the end of the deck
+    weights = np.where(np.arange(batch.num_actions) < batch.hand_size, 0.1, 1.0)
+    weights = weights * legal
+    return int(rng.choice(batch.num_actions, p=weights / weights.sum()))
+
+
+@pytest.mark.parametrize("players", [2, 3, 4, 5])
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_updates_match_rebuild(players, seed):
+    rng = np.random.default_rng(seed)
+    batch = BatchGame(1, players, rng)
+    H = batch.hand_size
+    zobrist = rebuild(batch)
+    while not batch.done[0]:
+        action = random_step(batch, rng)
+        seat = int(batch.current[0])
+        if action < 2 * H:
+            slot = action % H
+            card = TYPES[batch.hands[0, seat, slot]]
+            playable = batch.fireworks[0, card // 5] == card % 5
+        batch.step(np.array([action]))
+        if action < 2 * H:
+            hand_length = int((batch.hands[0, seat] >= 0).sum())
+            if action >= H:
+                zobrist.discard(seat, slot, hand_length, card)
+            elif playable:
+                zobrist.play(seat, slot, hand_length, card)
+            else:
+                zobrist.misplay(seat, slot, hand_length, card)
+            # The drawn card is seen with the next view
+            if seat != 0:
+                zobrist.set_hand(seat, hand_types(batch.hands[0, seat]))
+        else:
+            zobrist.hint()
+            destination = (seat + (action - 2 * H) // 10 + 1) % players
+            for slot in range(H):
+                if batch.hands[0, destination, slot] >= 0:
+                    zobrist.set_knowledge(
+                        destination, slot, batch.knowledge[0, destination, slot]
+                    )
+        zobrist.set_turn(int(batch.current[0]))
+        expected = rebuild(batch)
+        assert zobrist.value == expected.value
+        assert zobrist.canonical() == expected.canonical()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_canonical_ignores_color_permutation(seed):
+    rng = np.random.default_rng(seed)
+    batch = BatchGame(1, 3, rng)
+    for _ in range(20):
+        if batch.done[0]:
+            break
+        batch.step(np.array([random_step(batch, rng)]))
+    state = rebuild(batch)
+    for permutation in (np.roll(np.arange(5), 1), rng.permutation(5)):
+        permuted = rebuild(permute_colors(batch, permutation))
+        assert permuted.canonical() == state.canonical()
+    # Only the plain hash tells the colors apart
+    assert rebuild(permute_colors(batch, np.roll(np.arange(5), 1))).value != state.value
+    batch.step(np.array([random_step(batch, rng)]))
+    assert rebuild(batch).canonical() != state.canonical()
+
+
+class ViewChecker:
+    """Compare the hash of each bot with its view rebuilt from scratch, like a log."""
+
+    def __init__(self) -> None:
+        self.checked = 0
+
+    def add(self, bot, infos) -> None:
+        hand_size = 5 if len(bot.players) < 4 else 4
+        expected = ZobristHash()
+        expected.reset(len(bot.players), hand_size)
+        for seat, name in enumerate(bot.players):
+            expected.set_hand(seat, [bot._card_type(c) for c in bot.player_cards[name]])
+            knowledge = bot.players_knowledge[name]
+            for slot in range(hand_size):
+                if slot < len(knowledge):
+                    expected.set_knowledge(seat, slot, knowledge[slot].can_be)
+                else:
+                    expected.set_knowledge(seat, slot, np.zeros([5, 5], dtype=bool))
+        expected.set_fireworks(np.sum(bot.table.table_array, axis=1).tolist())
+        expected.set_discards(bot.table.discard_array)
+        expected.set_tokens(infos.usedNoteTokens, infos.usedStormTokens)
+        expected.set_turn(bot.players.index(infos.currentPlayer))
+        assert bot.state_hash.value == expected.value
+        self.checked += 1
+
+
+def test_bots_track_their_view():
+    from headless import make_bot, play_games
+
+    bots = [make_bot("Nexto", f"Bot{i}", 3, seed=i) for i in range(3)]
+    checker = ViewChecker()
+    play_games(bots, 3, seed=0, log=checker)
+    assert checker.checked > 0